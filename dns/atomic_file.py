@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from os import replace as os_replace, getpid
+from pathlib import Path
+from threading import get_ident
+
+
+def write_atomic(path: Path, data: str):
+    # replace the old file atomically so a crash while writing does not corrupt it
+    #   the temp-file is unique per process and thread => concurrent writers do not clash
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = f'{path}.{getpid()}.{get_ident()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(data)
+
+    os_replace(tmp, path)
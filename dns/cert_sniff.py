@@ -4,46 +4,310 @@
 # Copyright (C) 2024 Rath Pascal
 # License: GPLv3
 
-from subprocess import Popen as ProcessOpen
-from subprocess import PIPE, TimeoutExpired, SubprocessError, CalledProcessError
-from json import dumps as json_dumps
+from ssl import SSLContext, PROTOCOL_TLS_CLIENT, CERT_NONE, TLSVersion, SSLError
+from asyncio import run as asyncio_run, open_connection, wait_for, gather, get_running_loop
+from asyncio import TimeoutError as AsyncTimeoutError
+from socket import socket, SOCK_STREAM
+from ipaddress import ip_address, ip_network
+from resource import getrlimit, setrlimit, RLIMIT_NOFILE
+from pathlib import Path
+from time import time
+from hashlib import sha256
+from json import dumps as json_dumps, loads as json_loads, JSONDecodeError
 from argparse import ArgumentParser
+from sys import exit as sys_exit
+from typing import Iterator, Callable
 
+from cryptography.x509 import load_der_x509_certificate, SubjectAlternativeName, DNSName, IPAddress, ExtensionNotFound
 from validators import domain as valid_domain
-from dns.resolver import Resolver, NoAnswer, NXDOMAIN
+from resolver_pool import ResolverPool, AsyncAdaptiveLimit
+from atomic_file import write_atomic
+from dns_cache import init_cache
+from dns.resolver import NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers
 
 NAMESERVERS = ['1.1.1.1']
+OUT_DIR = Path(__file__).parent.resolve() / 'out'
+PROGRESS_INTERVAL = 10_000
+RESERVED_FILES = 64
 
 
-def _process(cmd: str) -> str:
+def _ssl_context() -> SSLContext:
+    # we want the certificate of any server - also self-signed, expired or using outdated protocols
+    ctx = SSLContext(PROTOCOL_TLS_CLIENT)
+    ctx.check_hostname = False
+    ctx.verify_mode = CERT_NONE
+    ctx.minimum_version = TLSVersion.MINIMUM_SUPPORTED
     try:
-        with ProcessOpen(
-            cmd,
-            shell=True,
-            stdout=PIPE,
-        ) as p:
-            b_stdout, _ = p.communicate(timeout=3)
-            return b_stdout.decode('utf-8').strip()
+        ctx.set_ciphers('ALL:@SECLEVEL=0')
+
+    except SSLError:
+        pass
+
+    return ctx
+
+
+def parse_san(der: bytes) -> dict:
+    try:
+        san = load_der_x509_certificate(der).extensions.get_extension_for_class(SubjectAlternativeName).value
+
+    except (ExtensionNotFound, ValueError):
+        return {'domains': [], 'ips': []}
+
+    return {
+        'domains': [d for d in san.get_values_for_type(DNSName) if valid_domain(d)],
+        'ips': [str(ip) for ip in san.get_values_for_type(IPAddress)],
+    }
+
+
+class CertCache:
+    # the same certificate is often served by many hosts => parse it only once, also over multiple runs
+    def __init__(self, path: Path):
+        self.path = path
+        self.certs = {}
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.certs = json_loads(f.read())
+
+        except FileNotFoundError:
+            pass
+
+        except JSONDecodeError:
+            print(f'WARNING: Ignoring the corrupt certificate cache {self.path}')
+
+    def parse(self, der: bytes) -> tuple[str, dict]:
+        fingerprint = sha256(der).hexdigest()
+        san = self.certs.get(fingerprint)
+        if san is None:
+            self.misses += 1
+            san = parse_san(der)
+            self.certs[fingerprint] = san
+
+        else:
+            self.hits += 1
+
+        return fingerprint, san
+
+    def save(self):
+        if self.misses == 0:
+            return
+
+        write_atomic(self.path, json_dumps(self.certs))
+
+    def print_stats(self):
+        print(f'INFO: Certificates - {self.misses} parsed, {self.hits} served from the cache')
 
-    except (TimeoutExpired, SubprocessError, CalledProcessError, OSError, IOError):
-        return ''
 
+def _is_ip(host: str) -> bool:
+    try:
+        ip_address(host)
+        return True
+
+    except ValueError:
+        return False
+
+
+async def _connect(host: str, port: int) -> socket:
+    loop = get_running_loop()
+    family, _, _, _, addr = (await wait_for(loop.getaddrinfo(host, port, type=SOCK_STREAM), timeout=CONNECT_TIMEOUT))[0]
+    sock = socket(family, SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        await wait_for(loop.sock_connect(sock, addr), timeout=CONNECT_TIMEOUT)
+
+    except (OSError, AsyncTimeoutError):
+        sock.close()
+        raise
+
+    return sock
+
+
+async def get_cert(host: str, port: int, sni: (str, None)) -> (bytes, None):
+    # the handshake is done in-process => no openssl processes per target
+    #   connect and handshake have their own timeouts so filtered ports free their slot fast
+    try:
+        sock = await _connect(host, port)
+
+    except (OSError, AsyncTimeoutError, UnicodeError):
+        return None
 
-def _get_web_cert_san(domain: str) -> str:
     try:
-        return _process(
-            f"openssl s_client -connect {domain}:{PORT} -status </dev/null 2>/dev/null | "
-            "openssl x509 -noout -text 2>/dev/null | "
-            "grep 'Subject Alternative Name:' -A 1",
-        ).split('\n', 1)[1]
+        _, writer = await wait_for(
+            open_connection(sock=sock, ssl=SSL_CONTEXT, server_hostname=sni if sni is not None else ''),
+            timeout=TIMEOUT,
+        )
+
+    except (OSError, SSLError, AsyncTimeoutError, ValueError):
+        sock.close()
+        return None
+
+    try:
+        return writer.get_extra_info('ssl_object').getpeercert(binary_form=True)
+
+    finally:
+        writer.close()
+        try:
+            await wait_for(writer.wait_closed(), timeout=TIMEOUT)
+
+        except (OSError, SSLError, AsyncTimeoutError):
+            pass
+
+
+def _sni_variants(host: str) -> list[(str, None)]:
+    # IPs are only sent a server-name if one was provided
+    if _is_ip(host):
+        if SNI == 'none' or SNI_NAME is None:
+            return [None]
+
+        return [SNI_NAME] if SNI == 'auto' else [None, SNI_NAME]
+
+    if SNI == 'none':
+        return [None]
 
-    except IndexError:
-        return ''
+    return [host] if SNI == 'auto' else [host, None]
+
+
+def _iter_probes(hosts: Iterator[str]) -> Iterator[tuple[str, int, (str, None)]]:
+    for host in hosts:
+        for port in PORTS:
+            for sni in _sni_variants(host):
+                yield host, port, sni
+
+
+async def _probe_worker(probes: Iterator[tuple[str, int, (str, None)]], callback: Callable, stats: dict):
+    # the workers share the lazy probe-iterator => memory does not grow with the size of the networks
+    for host, port, sni in probes:
+        stats['probes'] += 1
+        if stats['probes'] % PROGRESS_INTERVAL == 0:
+            runtime = time() - stats['start']
+            print(f"INFO: {stats['probes']} handshakes in {int(runtime)}s ({int(stats['probes'] / runtime)}/s)")
+
+        der = await get_cert(host, port, sni)
+        if der is not None:
+            stats['certs'] += 1
+            callback(host, port, sni, *CERT_CACHE.parse(der))
+
+
+async def run_probes(probes: Iterator[tuple[str, int, (str, None)]], callback: Callable, concurrency: int) -> dict:
+    # the amount of workers is the global budget of connections in-flight
+    probes = iter(probes)
+    stats = {'probes': 0, 'certs': 0, 'start': time()}
+    await gather(*[_probe_worker(probes, callback, stats) for _ in range(concurrency)])
+    return stats
+
+
+def _iter_sweep_hosts(entries: list[str]) -> Iterator[str]:
+    for entry in entries:
+        entry = entry.strip().lower().rstrip('.')
+        if entry == '' or entry.startswith('#'):
+            continue
+
+        try:
+            net = ip_network(entry, strict=False)
+
+        except ValueError:
+            if valid_domain(entry):
+                yield entry
+
+            else:
+                print(f"WARNING: Skipping invalid sweep target '{entry}'")
+
+            continue
+
+        for ip in (iter(net) if net.num_addresses <= 2 else net.hosts()):
+            yield str(ip)
+
+
+def _raise_open_files_limit() -> int:
+    # every handshake in-flight needs a file-descriptor
+    soft, hard = getrlimit(RLIMIT_NOFILE)
+    if soft < hard:
+        try:
+            setrlimit(RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+
+        except (ValueError, OSError):
+            pass
+
+    return soft
+
+
+def sweep(entries: list[str]):
+    concurrency = CONCURRENCY
+    open_files = _raise_open_files_limit()
+    if concurrency > open_files - RESERVED_FILES:
+        concurrency = max(open_files - RESERVED_FILES, 1)
+        print(f'WARNING: Lowered the concurrency to {concurrency} because of the open-files limit')
+
+    Path(OUTPUT).parent.mkdir(parents=True, exist_ok=True)
+    with open(OUTPUT, 'w', encoding='utf-8', buffering=1) as out:
+        def _write(host: str, port: int, sni: (str, None), fingerprint: str, san: dict):
+            out.write(json_dumps({'host': host, 'port': port, 'sni': sni, 'sha256': fingerprint, **san}) + '\n')
+
+        stats = asyncio_run(run_probes(_iter_probes(_iter_sweep_hosts(entries)), _write, concurrency))
+
+    print(
+        f"INFO: {stats['probes']} handshakes tried, {stats['certs']} certificates received "
+        f"in {int(time() - stats['start'])}s - written to {OUTPUT}"
+    )
+    CERT_CACHE.print_stats()
+    CERT_CACHE.save()
+
+
+async def _resolve_ips(dns: ResolverPool, name: str) -> list[str]:
+    ips = []
+    for rdtype in ['A', 'AAAA']:
+        try:
+            ips.extend(await dns.resolve_async(name, rdtype))
+
+        except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers):
+            continue
+
+    return ips
+
+
+async def _sniff(dns: ResolverPool, targets: list[str], cert_data: dict):
+    # with recursion the new names found in the certificates are resolved and probed in turn
+    #   hosts and certificates are only processed once - no matter how many names point to them
+    probed = set()
+    names = set(targets)
+    fingerprints = set()
+    found = set()
+
+    def _collect(_host: str, _port: int, _sni: (str, None), fingerprint: str, san: dict):
+        if fingerprint in fingerprints:
+            return
+
+        fingerprints.add(fingerprint)
+        cert_data['domains'].extend(san['domains'])
+        cert_data['ips'].extend(san['ips'])
+        found.update(san['domains'])
+
+    for depth in range(RECURSION_DEPTH + 1):
+        level = [t for t in targets if t not in probed]
+        probed.update(level)
+        await run_probes(_iter_probes(level), _collect, CONCURRENCY)
+
+        new = sorted(found - names)
+        names.update(new)
+        found.clear()
+        if depth == RECURSION_DEPTH or len(new) == 0:
+            return
+
+        print(f'INFO: Following {len(new)} new names from the certificates (level {depth + 1})')
+        resolved = await gather(*[_resolve_ips(dns, n) for n in new])
+        targets = [n for n, ips in zip(new, resolved) if len(ips) > 0]
+        targets.extend(dict.fromkeys(ip for ips in resolved for ip in ips))
 
 
 def main():
-    dns = Resolver(configure=False)
-    dns.nameservers = NAMESERVERS
+    dns = ResolverPool(
+        nameservers=NAMESERVERS,
+        limit=AsyncAdaptiveLimit(maximum=CONCURRENCY),
+        cache=init_cache(max_size=10_000, disk=DISK_CACHE, max_age=CACHE_MAX_AGE, bypass=CACHE_BYPASS),
+    )
 
     cert_data = {
         'domains': [],
@@ -58,37 +322,29 @@ def main():
         targets.append(f'www.{TARGET}')
 
     try:
-        ips = [r.to_text() for r in dns.resolve(TARGET, 'A')]
+        ips = dns.resolve(TARGET, 'A')
         targets.extend(ips)
         for ip in ips:
-            targets.extend([p.to_text() for p in dns.resolve_address(ip)])
+            targets.extend(dns.resolve_address(ip))
 
     except (NoAnswer, NXDOMAIN):
         pass
 
     try:
-        ips = [r.to_text() for r in dns.resolve(TARGET, 'AAAA')]
+        ips = dns.resolve(TARGET, 'AAAA')
         targets.extend(ips)
         for ip in ips:
-            targets.extend([p.to_text() for p in dns.resolve_address(ip)])
+            targets.extend(dns.resolve_address(ip))
 
     except (NoAnswer, NXDOMAIN):
         pass
 
-    for t in targets:
-        for san in _get_web_cert_san(t).split(','):
-            san = san.strip()
-            try:
-                k, v = san.split(':', 1)
-                if k == 'DNS':
-                    if valid_domain(v):
-                        cert_data['domains'].append(v)
-
-                elif k == 'IP':
-                    cert_data['ips'].append(v)
-
-            except ValueError:
-                continue
+    # PTRs are fully-qualified => the trailing dot would end up in the SNI
+    targets = list(dict.fromkeys(t.rstrip('.') for t in targets))
+    asyncio_run(_sniff(dns, targets, cert_data))
+    dns.cache.close()
+    CERT_CACHE.print_stats()
+    CERT_CACHE.save()
 
     cert_data['domains'] = list(set(cert_data['domains']))
     cert_data['domains'].sort()
@@ -109,12 +365,74 @@ License: GPLv3
 """)
 
     parser = ArgumentParser()
-    parser.add_argument('-t', '--target', help='Target domain', required=True, type=str)
-    parser.add_argument('-p', '--port', help='Target port', default=443, type=int)
+    parser.add_argument('-t', '--target', help='Target domain', default=None, type=str)
+    parser.add_argument(
+        '-s', '--sweep', help='Comma-separated CIDRs, IPs or hostnames to sweep for certificates (instead of a target)',
+        default=None, type=str,
+    )
+    parser.add_argument(
+        '-S', '--sweep-file', help='File with one CIDR, IP or hostname to sweep per line', default=None, type=str,
+    )
+    parser.add_argument(
+        '-r', '--recursion-depth', help='Levels of new names from the certificates to resolve and probe in turn',
+        default=0, type=int,
+    )
+    parser.add_argument('-p', '--ports', help='Comma-separated target ports', default='443', type=str)
+    parser.add_argument(
+        '--sni', help="'auto' sends hostnames as server-name, 'none' never sends one, 'both' tries with and without",
+        default='auto', type=str, choices=['auto', 'none', 'both'],
+    )
+    parser.add_argument('--sni-name', help='Server-name to send when connecting to IPs', default=None, type=str)
+    parser.add_argument(
+        '-c', '--concurrency', help='Maximum of TLS handshakes to run at the same time', default=50, type=int,
+    )
+    parser.add_argument('--connect-timeout', help='Timeout in seconds for the TCP connection', default=1.0, type=float)
+    parser.add_argument('--timeout', help='Timeout in seconds for the TLS handshake', default=3, type=int)
+    parser.add_argument(
+        '-o', '--output', help='JSONL file to stream the sweep results to', default=f'{OUT_DIR}/cert_sweep.jsonl',
+        type=str,
+    )
+    parser.add_argument(
+        '-d', '--disk-cache', help='Use the persistent DNS cache shared between runs and tools (out/dns_cache.sqlite3)',
+        default=False, type=bool,
+    )
+    parser.add_argument(
+        '--cache-max-age', help='Re-use cached answers up to this age in seconds (default: use record TTLs)',
+        default=0, type=int,
+    )
+    parser.add_argument(
+        '--cache-bypass', help='Do not read from the persistent DNS cache (it is still updated)',
+        default=False, type=bool,
+    )
 
     args = parser.parse_args()
 
+    if (args.target is None) == (args.sweep is None and args.sweep_file is None):
+        print('ERROR: Provide either a target or networks/hosts to sweep!')
+        sys_exit(1)
+
     TARGET = args.target
-    PORT = args.port
+    PORTS = [int(p) for p in args.ports.split(',') if p.strip() != '']
+    SNI = args.sni
+    SNI_NAME = args.sni_name
+    CONCURRENCY = max(args.concurrency, 1)
+    CONNECT_TIMEOUT = args.connect_timeout
+    TIMEOUT = args.timeout
+    OUTPUT = args.output
+    RECURSION_DEPTH = max(args.recursion_depth, 0)
+    CERT_CACHE = CertCache(OUT_DIR / 'cert_cache.json')
+    SSL_CONTEXT = _ssl_context()
+    DISK_CACHE = args.disk_cache
+    CACHE_MAX_AGE = args.cache_max_age
+    CACHE_BYPASS = args.cache_bypass
+
+    if TARGET is not None:
+        main()
+
+    else:
+        sweep_entries = args.sweep.split(',') if args.sweep is not None else []
+        if args.sweep_file is not None:
+            with open(args.sweep_file, 'r', encoding='utf-8') as sweep_file:
+                sweep_entries.extend(sweep_file.read().splitlines())
 
-    main()
+        sweep(sweep_entries)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from hashlib import sha256
+from itertools import chain
+from json import dumps as json_dumps, loads as json_loads, JSONDecodeError
+from pathlib import Path
+from sys import maxunicode
+from unicodedata import normalize, category, unidata_version
+
+from atomic_file import write_atomic
+
+BASE_DIR = Path(__file__).parent.resolve()
+CONFUSABLES_FILE = BASE_DIR / 'confusables.txt'
+INDEX_FILE = BASE_DIR / 'out' / 'confusables_index.json'
+INDEX_FORMAT = 2
+
+
+def _usable(seq: str) -> bool:
+    # sequences that IDNA would map to others (case, compatibility-forms) can not be registered as they are
+    #   combining marks without a precomposed form are skipped as well
+    return all(category(c)[0] in ['L', 'N'] for c in seq) and seq == seq.lower() and normalize('NFKC', seq) == seq
+
+
+def _skeleton(seq: str, mapping: dict[str, str]) -> str:
+    # see: https://www.unicode.org/reports/tr39/#Confusable_Detection
+    #   the prototypes are stored decomposed => 'ӓ' and 'ä' share the skeleton 'a' + combining diaeresis
+    return normalize('NFD', ''.join(mapping.get(c, c) for c in normalize('NFD', seq)))
+
+
+def compile_index(path: Path) -> dict[str, list[str]]:
+    # all sequences that share the same skeleton form one group
+    #   => every sequence of a group can be replaced by all the others of it
+    #   prototypes can consist of multiple characters (p.e. 'm' => 'rn')
+    mapping = {}
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            fields = line.split('#', 1)[0].split(';')
+            if len(fields) < 2:
+                continue
+
+            source = ''.join(chr(int(cp, 16)) for cp in fields[0].split())
+            mapping[source] = ''.join(chr(int(cp, 16)) for cp in fields[1].split())
+
+    groups = {}
+    prototypes = (normalize('NFC', p) for p in set(mapping.values()))
+    for seq in chain((chr(cp) for cp in range(maxunicode + 1)), prototypes):
+        if _usable(seq):
+            groups.setdefault(_skeleton(seq, mapping), {})[seq] = None
+
+    index = {}
+    for group in groups.values():
+        for seq in group:
+            if len(group) > 1:
+                index[seq] = [a for a in group if a != seq]
+
+    return index
+
+
+def load_index(path: Path = CONFUSABLES_FILE, cache: Path = INDEX_FILE) -> dict[str, list[str]]:
+    # the compiled index is cached until the data, its format or the unicode-version of python changes
+    with open(path, 'rb') as f:
+        checksum = sha256(f.read()).hexdigest()
+
+    try:
+        with open(cache, 'r', encoding='utf-8') as f:
+            cached = json_loads(f.read())
+
+        if cached['checksum'] == checksum and cached['unicode'] == unidata_version and \
+                cached['format'] == INDEX_FORMAT:
+            return cached['index']
+
+    except (FileNotFoundError, JSONDecodeError, KeyError):
+        pass
+
+    index = compile_index(path)
+    write_atomic(cache, json_dumps(
+        {'checksum': checksum, 'unicode': unidata_version, 'format': INDEX_FORMAT, 'index': index},
+        ensure_ascii=False,
+    ))
+    return index
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from json import JSONDecoder, JSONDecodeError, dumps as json_dumps, loads as json_loads
+from pathlib import Path
+from typing import Iterator
+
+from httpx import stream, HTTPError
+from validators import domain as valid_domain
+from atomic_file import write_atomic
+
+CRTSH_URL = 'https://crt.sh/'
+TIMEOUT = 30
+TRIES = 4
+WHITESPACE = ' \t\r\n'
+
+
+def iter_json_array(chunks: Iterator[str]) -> Iterator:
+    # parses the elements of a JSON array while it is downloaded => we never hold the whole response in memory
+    decoder = JSONDecoder()
+    buffer = ''
+    started = False
+
+    for chunk in chunks:
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and (buffer[pos] in WHITESPACE or (started and buffer[pos] == ',')):
+                pos += 1
+
+            if pos >= len(buffer):
+                break
+
+            if not started:
+                if buffer[pos] != '[':
+                    raise JSONDecodeError('Expected a JSON array', buffer, pos)
+
+                started = True
+                pos += 1
+                continue
+
+            if buffer[pos] == ']':
+                return
+
+            try:
+                element, pos_end = decoder.raw_decode(buffer, pos)
+
+            except JSONDecodeError:
+                # the element is incomplete => wait for the next chunk
+                break
+
+            yield element
+            pos = pos_end
+
+        buffer = buffer[pos:]
+
+    raise JSONDecodeError('Incomplete JSON array', buffer, 0)
+
+
+class CTCache:
+    # names we already pulled from certificate-transparency logs, per target
+    #   later runs only parse the certificates that are newer than the last one we have seen
+    def __init__(self, path: Path):
+        self.path = path
+        self.last_id = 0
+        self.names = set()
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json_loads(f.read())
+
+            self.last_id = data['last_id']
+            self.names = set(data['names'])
+
+        except FileNotFoundError:
+            pass
+
+        except (JSONDecodeError, KeyError):
+            print(f'WARNING: Ignoring the corrupt certificate cache {self.path}')
+
+    def save(self):
+        write_atomic(self.path, json_dumps({'last_id': self.last_id, 'names': sorted(self.names)}))
+
+
+def _cert_names(cert: dict) -> Iterator[str]:
+    yield from cert['name_value'].split('\n')
+    if valid_domain(cert['common_name']):
+        yield cert['common_name']
+
+
+def fetch_certificate_domains(target: str, cache_file: Path) -> tuple[set[str], bool]:
+    # returns the known names and if all certificates could be downloaded
+    cache = CTCache(cache_file)
+    known = len(cache.names)
+    last_id = cache.last_id
+    complete = False
+
+    for _ in range(TRIES):
+        try:
+            with stream('GET', CRTSH_URL, params={'q': target, 'output': 'json'}, timeout=TIMEOUT) as r:
+                if r.status_code != 200:
+                    # crt.sh answers with 5xx-errors if it is overloaded
+                    continue
+
+                for cert in iter_json_array(r.iter_text()):
+                    if cert['id'] <= cache.last_id:
+                        continue
+
+                    last_id = max(last_id, cert['id'])
+                    cache.names.update(_cert_names(cert))
+
+            # only move on if we got all certificates - otherwise the next run has to re-check the missing ones
+            cache.last_id = last_id
+            complete = True
+            break
+
+        except (HTTPError, JSONDecodeError, KeyError, TypeError):
+            continue
+
+    else:
+        print('ERROR: Certificate information could not be downloaded completely!')
+
+    print(f'INFO: Got {len(cache.names) - known} new names from certificates ({len(cache.names)} known)')
+    cache.save()
+    return cache.names, complete
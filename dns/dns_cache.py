@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from threading import Lock
+from collections import OrderedDict
+from time import time
+from json import dumps as json_dumps, loads as json_loads
+from sqlite3 import connect as sqlite_connect, Error as SQLiteError
+from pathlib import Path
+
+from dns.resolver import NoAnswer, NXDOMAIN
+from dns.rdatatype import SOA
+
+NEGATIVE_TTL = 300
+DISK_COMMIT_INTERVAL = 1
+DISK_BATCH_SIZE = 100
+DISK_BUSY_TIMEOUT = 5000  # ms
+DISK_CACHE_FILE = Path(__file__).parent.resolve() / 'out' / 'dns_cache.sqlite3'
+
+STATUS_NOERROR = 'NOERROR'
+STATUS_NXDOMAIN = 'NXDOMAIN'
+STATUS_NOANSWER = 'NOANSWER'
+
+
+def cache_key(name, rdtype: str) -> tuple[str, str]:
+    return str(name).lower().rstrip('.'), rdtype.upper()
+
+
+def negative_ttl(e: (NXDOMAIN, NoAnswer)) -> int:
+    # RFC 2308 => the negative TTL is the minimum of the SOA TTL and its MINIMUM field
+    try:
+        if isinstance(e, NXDOMAIN):
+            responses = e.responses().values()
+
+        else:
+            responses = [e.response()]
+
+        for r in responses:
+            for rrset in r.authority:
+                if rrset.rdtype == SOA:
+                    return min(rrset.ttl, rrset[0].minimum)
+
+    except (KeyError, AttributeError, TypeError):
+        pass
+
+    return NEGATIVE_TTL
+
+
+def raise_cached(status: str, records: list[str]) -> list[str]:
+    if status == STATUS_NXDOMAIN:
+        raise NXDOMAIN
+
+    if status == STATUS_NOANSWER:
+        raise NoAnswer
+
+    return records
+
+
+class DiskCache:
+    # persistent SQLite cache that can be shared between runs and the different scripts
+    #   max_age overrides the record TTLs (p.e. to re-use the answers of last weeks scan)
+    #   bypass skips reading from the cache, but fresh answers are still written to it
+    #   other processes share the file => writes are buffered and flushed in short transactions,
+    #   errors (p.e. the database being locked for too long) are handled as cache misses
+    def __init__(self, path: (str, Path) = DISK_CACHE_FILE, max_age: int = 0, bypass: bool = False):
+        self.max_age = max_age
+        self.bypass = bypass
+        self.lock = Lock()
+        self.pending = []
+        self.last_commit = time()
+        self.failed = False
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite_connect(path, check_same_thread=False)
+        self.db.execute(f'PRAGMA busy_timeout={DISK_BUSY_TIMEOUT}')
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS answers ('
+            'name TEXT NOT NULL, rdtype TEXT NOT NULL, status TEXT NOT NULL, records TEXT NOT NULL, '
+            'stored REAL NOT NULL, expires REAL NOT NULL, PRIMARY KEY (name, rdtype))'
+        )
+        self.db.commit()
+
+    def get(self, key: tuple[str, str]) -> (tuple[str, list[str], float], None):
+        if self.bypass:
+            return None
+
+        with self.lock:
+            try:
+                row = self.db.execute(
+                    'SELECT status, records, stored, expires FROM answers WHERE name = ? AND rdtype = ?', key,
+                ).fetchone()
+
+            except SQLiteError as e:
+                self._failed(e)
+                return None
+
+        if row is None:
+            return None
+
+        status, records, stored, expires = row
+        if self.max_age > 0:
+            expires = stored + self.max_age
+
+        if expires < time():
+            return None
+
+        return status, json_loads(records), expires
+
+    def set(self, key: tuple[str, str], status: str, records: list[str], ttl: int):
+        now = time()
+        with self.lock:
+            self.pending.append((*key, status, json_dumps(records), now, now + max(ttl, 0)))
+            if len(self.pending) >= DISK_BATCH_SIZE or now - self.last_commit > DISK_COMMIT_INTERVAL:
+                self._flush()
+
+    def _flush(self):
+        # one short write-transaction per batch => we never keep the database locked between writes
+        self.last_commit = time()
+        if len(self.pending) == 0:
+            return
+
+        try:
+            with self.db:
+                self.db.executemany(
+                    'INSERT OR REPLACE INTO answers (name, rdtype, status, records, stored, expires) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    self.pending,
+                )
+
+        except SQLiteError as e:
+            self._failed(e)
+
+        self.pending = []
+
+    def _failed(self, e: SQLiteError):
+        if not self.failed:
+            print(f'WARNING: The persistent DNS cache is not usable at the moment - continuing without it ({e})')
+            self.failed = True
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.db.close()
+
+
+class AnswerCache:
+    # thread-safe in-memory cache for DNS answers
+    #   entries expire after their TTL and the least recently used ones get evicted if the cache is full
+    #   misses fall through to the optional persistent cache
+    def __init__(self, max_size: int = 100_000, disk: DiskCache = None):
+        self.max_size = max_size
+        self.disk = disk
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple[str, str]) -> (tuple[str, list[str]], None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                status, records, expires = entry
+                if expires >= time():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return status, records
+
+                del self.entries[key]
+
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                status, records, expires = entry
+                self._set_memory(key, status, records, int(expires - time()))
+                with self.lock:
+                    self.disk_hits += 1
+
+                return status, records
+
+        with self.lock:
+            self.misses += 1
+
+        return None
+
+    def _set_memory(self, key: tuple[str, str], status: str, records: list[str], ttl: int):
+        if ttl <= 0 or self.max_size <= 0:
+            return
+
+        with self.lock:
+            self.entries[key] = (status, records, time() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def set(self, key: tuple[str, str], status: str, records: list[str], ttl: int):
+        self._set_memory(key, status, records, ttl)
+        if self.disk is not None:
+            self.disk.set(key, status, records, ttl)
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+def init_cache(max_size: int, disk: bool, max_age: int = 0, bypass: bool = False) -> AnswerCache:
+    return AnswerCache(
+        max_size=max_size,
+        disk=DiskCache(max_age=max_age, bypass=bypass) if disk else None,
+    )
@@ -4,224 +4,648 @@
 # Copyright (C) 2024 Rath Pascal
 # License: GPLv3
 
+# pylint: disable=C0302
+
 from pathlib import Path
-from threading import Thread, Lock
-from time import sleep, time
-from json import dumps as json_dumps
+from threading import Thread, Lock, Event
+from queue import Queue, Empty
+from time import time, sleep
+from asyncio import run as asyncio_run, gather, create_task, to_thread, Queue as AsyncQueue, CancelledError
+from json import dumps as json_dumps, loads as json_loads
+from multiprocessing import Process
 from argparse import ArgumentParser
 from sys import exit as sys_exit
-from json import JSONDecodeError
+from itertools import islice, chain
+from typing import Iterator, AsyncIterator
 
 from whois import whois
-from httpx import request, ReadTimeout, ConnectTimeout
-from validators import domain as valid_domain
-from dns.resolver import Resolver, NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers
+from resolver_pool import ResolverPool, AdaptiveLimit, AsyncAdaptiveLimit, load_nameservers
+from dns_cache import init_cache, cache_key, STATUS_NOERROR, STATUS_NXDOMAIN
+from udp_resolver import UDPResolver
+from wordlist import iter_wordlist, in_shard, BloomFilter
+from zone_walk import zone_transfer, nsec_walk
+from shards import merge_shards
+from result_store import ResultStore
+from atomic_file import write_atomic
+from label_index import load_label_counts, rank_words
+from crtsh import fetch_certificate_domains
+from permutations import iter_permutations, PERMUTATION_WORDS
+from dns.resolver import NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers
 from dns.exception import SyntaxError as DNSSyntaxError
 
 
 BASE_DIR = Path(__file__).parent.resolve()
 
-NAMESERVERS = ['1.1.1.1']
+DEFAULT_NAMESERVERS = '1.1.1.1'
+WHOIS_TIMEOUT = 30
+UDP_MIN_IN_FLIGHT = 10
+BRUTE_FORCE_SOURCES = ['wordlist', 'recursive', 'permutation']
+ZONE_SOURCES = ['axfr', 'nsec']
+# stages that are not covered by the wordlist position => their completion is kept in the checkpoint
+STAGE_SOURCES = {'spf': 'records', 'cert': 'certificates'}
+PERMUTATION_MAX_SIBLINGS = 20
 
 
-def subdomain(sub: str) -> str:
-    return f'{sub.strip()}.{TARGET}'
+class ResultStream:
+    # appends one JSON line per finding so downstream tools can consume results while the scan is running
+    def __init__(self, path: Path, append: bool):
+        self.lock = Lock()
+        # line-buffered => every finding is visible (p.e. to 'tail -f') as soon as it is written
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8', buffering=1)  # pylint: disable=R1732
 
+    def write(self, data: dict):
+        line = json_dumps(data) + '\n'
+        with self.lock:
+            self.file.write(line)
 
-def allow_follow(dom: str) -> bool:
-    return FOLLOW_OTHER or \
-        dom.find(TARGET_BASE) != -1  # allow follow to related domains
+    def close(self):
+        with self.lock:
+            self.file.close()
 
 
 class DNSRecon:
-    def __init__(self):
+    # pylint: disable=R0902
+    # the resolver pool (with its cache and concurrency limit) can be shared by multiple targets
+    def __init__(self, target: str, dns: ResolverPool, stop: Event = None):
+        self.target = target
+        self.target_base = target.rsplit('.', 1)[0]
         self.lock = Lock()
-        self.results = {}
-        self.dns = Resolver(configure=False)
-        self.dns.nameservers = NAMESERVERS
+        self.results = ResultStore()
+        self.dns = dns
+        self.stop = stop if stop is not None else Event()
         self.wildcard_exists = False
         self.wildcard_ips = {}
-        self.start_time = time()
+        # checkpoint state: words before the position are done, pending ones are queued or in-flight
+        #   stages are done once they produced all their names and those were looked-up
+        self.progress = {
+            'start': time(), 'position': 0, 'next': 0, 'pending': set(), 'last_checkpoint': time(), 'ranked': [],
+            'stages': set(), 'produced': set(), 'stage_pending': {}, 'failed': 0,
+        }
+        self.stream = None
+        self.in_flight = set()
+        self.submitted = BloomFilter(capacity=DEDUPE_CAPACITY)
+        self.auth = None
+        # wildcard records of the sub-levels we scanned recursively (None if there is none)
+        self.wildcards = {}
+        self.expanded = set()
+        self.whois = None
+
+    @staticmethod
+    def init_limit() -> AdaptiveLimit:
+        return AdaptiveLimit(maximum=THREADS)
+
+    def _subdomain(self, sub: str) -> str:
+        return f'{sub.strip()}.{self.target}'
+
+    def _allow_follow(self, dom: str) -> bool:
+        return FOLLOW_OTHER or \
+            dom.find(self.target_base) != -1  # allow follow to related domains
 
     def run(self):
-        self.results[TARGET] = {
-            'shodan_url': f'https://www.shodan.io/search?query=hostname%3A{TARGET}',
-            'shodan_url2': f'https://www.shodan.io/domain/{TARGET}',
-            'censys_url': f'https://search.censys.io/search?resource=hosts&sort=RELEVANCE&per_page=25&virtual_hosts=INCLUDE&q={TARGET}',
-            'google_url': f'https://www.google.com/search?q=site%3A{TARGET}',
-            'cert_search_url': f'https://crt.sh/?q={TARGET}',
-            'dnsdumpster_url': f'https://dnsdumpster.com/?q={TARGET}',
-            'hostio_url': f'https://host.io/{TARGET}',
-        }
-        self._process_basic_records()
-        self._process_certificate_search()
-        self.wildcard_exists, self.wildcard_ips = self._check_for_wildcard()
+        resumed = RESUME and self._load_checkpoint()
+        if JSONL:
+            self.stream = ResultStream(self._out_dir() / 'enum.jsonl', append=resumed)
+
+        whois_fetcher = Thread(target=self._fetch_whois, daemon=True)
+        if SHARD_INDEX == 0:
+            whois_fetcher.start()
+
+        if not resumed:
+            self.results[self.target] = {
+                'shodan_url': f'https://www.shodan.io/search?query=hostname%3A{self.target}',
+                'shodan_url2': f'https://www.shodan.io/domain/{self.target}',
+                'censys_url': 'https://search.censys.io/search?resource=hosts&sort=RELEVANCE&per_page=25'
+                              f'&virtual_hosts=INCLUDE&q={self.target}',
+                'google_url': f'https://www.google.com/search?q=site%3A{self.target}',
+                'cert_search_url': f'https://crt.sh/?q={self.target}',
+                'dnsdumpster_url': f'https://dnsdumpster.com/?q={self.target}',
+                'hostio_url': f'https://host.io/{self.target}',
+            }
+            if not self._check_target():
+                if self.stream is not None:
+                    self.stream.close()
+
+                return False
+
+            self.wildcard_exists, self.wildcard_ips = self._check_for_wildcard()
+            self.progress['ranked'] = self._rank_wordlist()
+            self._save_checkpoint()
+
+        if AUTHORITATIVE:
+            self._init_authoritative()
 
         try:
-            self._process_wordlist()
+            self._run_stages()
+            self._run_recursion()
+            self._finish_checkpoint()
 
         except KeyboardInterrupt:
+            self.stop.set()
             print()
             print('WARNING: SCAN INTERRUPTED')
+            self._save_checkpoint()
+            print("INFO: Checkpoint saved - continue the scan using '--resume 1'")
+
+        if whois_fetcher.is_alive():
+            whois_fetcher.join(timeout=WHOIS_TIMEOUT)
 
         self._save_results()
-        print('DONE')
+        if self.stream is not None:
+            self.stream.close()
+
+        if self.auth is not None:
+            self.auth.print_stats()
+
+        return True
+
+    def _out_dir(self) -> Path:
+        out = BASE_DIR / 'out' / self.target.replace('.', '_')
+        if SHARD_COUNT > 1:
+            out = out / f'shard-{SHARD_INDEX}-of-{SHARD_COUNT}'
+
+        out.mkdir(parents=True, exist_ok=True)
+        return out
+
+    def _load_checkpoint(self) -> bool:
+        try:
+            with open(self._out_dir() / 'checkpoint.json', 'r', encoding='utf-8') as f:
+                checkpoint = json_loads(f.read())
+
+        except FileNotFoundError:
+            print('WARNING: No checkpoint found - starting a new scan')
+            return False
+
+        if checkpoint['wordlist'] != WORDLIST or checkpoint['dedupe_capacity'] != DEDUPE_CAPACITY:
+            print('WARNING: The checkpoint was created using another wordlist - starting a new scan')
+            return False
+
+        self.results = ResultStore.from_json(checkpoint['results'])
+        self.wildcard_exists = checkpoint['wildcard_exists']
+        self.wildcard_ips = checkpoint['wildcard_ips']
+        self.progress['position'] = checkpoint['position']
+        self.progress['next'] = checkpoint['position']
+        self.progress['ranked'] = checkpoint.get('ranked', [])
+        self.progress['stages'] = set(checkpoint.get('stages', []))
+        print(f"RESUMING SCAN at word {checkpoint['position']} ({len(self.results)} results)")
+        return True
+
+    def _save_checkpoint(self):
+        with self.lock:
+            if len(self.progress['pending']) > 0:
+                self.progress['position'] = min(self.progress['pending'])
+
+            else:
+                self.progress['position'] = self.progress['next']
+
+            self.progress['stages'].update(
+                stage for stage in self.progress['produced'] if self.progress['stage_pending'].get(stage, 0) == 0
+            )
+            checkpoint = {
+                'wordlist': WORDLIST,
+                'dedupe_capacity': DEDUPE_CAPACITY,
+                'position': self.progress['position'],
+                'ranked': self.progress['ranked'],
+                'stages': sorted(self.progress['stages']),
+                'wildcard_exists': self.wildcard_exists,
+                'wildcard_ips': self.wildcard_ips,
+                'results': self.results.export(),
+            }
+            self.progress['last_checkpoint'] = time()
+
+        write_atomic(self._out_dir() / 'checkpoint.json', json_dumps(checkpoint))
+
+    def _checkpoint_due(self) -> bool:
+        # only one of the producers saves the checkpoint
+        with self.lock:
+            if time() - self.progress['last_checkpoint'] <= CHECKPOINT_INTERVAL:
+                return False
+
+            self.progress['last_checkpoint'] = time()
+            return True
+
+    def _finish_checkpoint(self):
+        if self._out_of_time():
+            # the less promising words are left => they can still be scanned using '--resume'
+            print(f'WARNING: Time budget of {TIME_BUDGET}s used up - stopped the scan')
+            self._save_checkpoint()
+
+        elif self.progress['failed'] > 0:
+            print(f"WARNING: {self.progress['failed']} lookups failed - retry them using '--resume 1'")
+            self._save_checkpoint()
+
+        else:
+            self._remove_checkpoint()
+
+    def _remove_checkpoint(self):
+        (self._out_dir() / 'checkpoint.json').unlink(missing_ok=True)
+
+    def _word_started(self, idx: int):
+        with self.lock:
+            self.progress['pending'].add(idx)
+            self.progress['next'] = idx + 1
+
+    def _word_done(self, idx: int):
+        with self.lock:
+            self.progress['pending'].discard(idx)
+
+    def _stage_skipped(self, stage: str) -> bool:
+        if stage in self.progress['stages']:
+            print(f'INFO: Skipping the {stage} stage - it was done before the checkpoint')
+            return True
+
+        return False
+
+    def _stage_produced(self, stage: str):
+        with self.lock:
+            self.progress['produced'].add(stage)
+
+    def _item_done(self, source: str, idx: (int, None)):
+        with self.lock:
+            if idx is not None:
+                self.progress['pending'].discard(idx)
+
+            stage = STAGE_SOURCES.get(source)
+            if stage is not None:
+                self.progress['stage_pending'][stage] -= 1
 
     def _save_results(self):
         print('SAVING INFORMATION')
 
-        out = BASE_DIR / 'out' / TARGET.replace('.', '_')
-        out.mkdir(exist_ok=True)
+        out = self._out_dir()
+
+        with self.lock:
+            results = json_dumps(self.results.export(), indent=4)
 
         with open(out / 'enum.json', 'w', encoding='utf-8') as f:
-            f.write(json_dumps(self.results, indent=4))
+            f.write(results)
+
+        if self.whois is not None:
+            with open(out / 'whois.json', 'w', encoding='utf-8') as f:
+                f.write(json_dumps(self.whois, indent=4, default=str))
+
+    def _fetch_whois(self):
+        try:
+            self.whois = whois(self.target)
+
+        except ConnectionResetError:
+            print('ERROR: Fetching Whois data')
+
+    def _producers(self, queue: Queue) -> list[Thread]:
+        # every stage produces (domain, source, wordlist-index) items for the shared lookup workers
+        return [
+            Thread(target=self._produce, kwargs={'queue': queue, 'items': items}, daemon=True)
+            for items in [self._stage_records(), self._stage_certificates(), self._stage_wordlist()]
+        ]
 
-        with open(out / 'whois.json', 'w', encoding='utf-8') as f:
+    def _run_stages(self, items: Iterator[tuple[str, str, (int, None)]] = None):
+        queue = Queue(maxsize=THREADS * 2)
+        workers = [
+            Thread(target=self._lookup_worker, kwargs={'queue': queue}, daemon=True)
+            for _ in range(THREADS)
+        ]
+        if items is None:
+            producers = self._producers(queue)
+
+        else:
+            producers = [Thread(target=self._produce, kwargs={'queue': queue, 'items': items}, daemon=True)]
+
+        for t in workers + producers:
+            t.start()
+
+        self._wait(producers)
+
+        # one stop-marker per worker; they exit once the queue is drained
+        for _ in workers:
+            queue.put(None)
+
+        self._wait(workers)
+
+        if self.stop.is_set():
+            raise KeyboardInterrupt
+
+    def _wait(self, threads: list[Thread]):
+        # Ctrl+C only stops the scan - the threads must have exited before the results & checkpoint are saved
+        #   an interrupted Thread.join can mark a running thread as stopped => poll instead
+        while any(t.is_alive() for t in threads):
             try:
-                f.write(json_dumps(whois(TARGET), indent=4, default=str))
+                sleep(0.1)
 
-            except ConnectionResetError:
-                print('ERROR: Fetching Whois data')
+            except KeyboardInterrupt:
+                self.stop.set()
 
-    def _process_wordlist(self):
-        print()
-        print('STARTING SUBDOMAIN SCAN')
+    def _produce(self, queue: Queue, items: Iterator[tuple[str, str, (int, None)]]):
+        for item in items:
+            if self._stopped():
+                return
+
+            item = self._submit(*item)
+            if item is not None:
+                queue.put(item)
+
+            if self._checkpoint_due():
+                self._save_checkpoint()
+
+    def _submit(self, dom: str, source: str, idx: (int, None)) -> (tuple[str, str, (int, None)], None):
+        # names found by multiple stages are only looked-up once
+        dom = dom.lower().rstrip('.')
+        if idx is not None:
+            self._word_started(idx)
+
+        with self.lock:
+            new = self.submitted.add(dom)
+            stage = STAGE_SOURCES.get(source)
+            if new and stage is not None:
+                self.progress['stage_pending'][stage] = self.progress['stage_pending'].get(stage, 0) + 1
+
+        if not new:
+            if idx is not None:
+                self._word_done(idx)
+
+            return None
+
+        return dom, source, idx
+
+    def _lookup_worker(self, queue: Queue):
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+
+            if self._stopped():
+                # drain the queue so the producers are not blocked; the item stays pending
+                continue
+
+            dom, source, idx = item
+            try:
+                self._lookup(dom, source=source)
 
-        with open(WORDLIST, 'r', encoding='utf-8') as f:
-            wordlist = f.readlines()
-
-        batch = 0
-        while batch * THREADS < len(wordlist):
-            threads = []
-            for i in range(THREADS):
-                idx = (batch * THREADS) + i
-                if idx > len(wordlist) - 1:
-                    break
-
-                threads.append(Thread(
-                    target=self._lookup_sub,
-                    kwargs={'word': wordlist[idx]},
-                ))
-                if idx % 500 == 0 and idx != 0:
-                    print(
-                        f'INFO: {int((100 / len(wordlist)) * idx)}% ({idx}/{len(wordlist)}) '
-                        f'in {int(time()-self.start_time)}s'
-                    )
-
-            for t in threads:
-                t.start()
-
-            threads_done = False
-            while not threads_done:
-                threads_done = all(not t.is_alive() for t in threads)
-                sleep(0.05)
-
-            batch += 1
-
-    def _process_basic_records(self):
+            except Exception as e:  # pylint: disable=W0718
+                # a dead worker would leave the queue undrained and the producers blocked forever
+                #   the item stays pending => a resumed scan retries it
+                self._lookup_failed(dom, e)
+                continue
+
+            self._item_done(source, idx)
+
+    def _lookup_failed(self, dom: str, e: Exception):
+        print(f"ERROR: Lookup of '{dom}' failed: {e!r}")
+        self._release(dom)
+        with self.lock:
+            self.progress['failed'] += 1
+
+    def _wordlist(self) -> Iterator[tuple[int, str]]:
+        # the stream is deterministic => we can skip the words that were processed before the checkpoint
+        #   duplicates are dropped by the filter shared between all stages
+        #   the index stays the position in the whole wordlist if we only scan a shard of it
+        #   the words found by previous scans come first - the order is kept in the checkpoint
+        ranked = self.progress['ranked']
+        skip = set(ranked)
+        words = chain(ranked, (w for w in iter_wordlist(WORDLIST) if w not in skip))
+        for idx, word in enumerate(words):
+            if idx >= self.progress['position'] and in_shard(word, SHARD_INDEX, SHARD_COUNT):
+                yield idx, word
+
+    def _rank_wordlist(self) -> list[str]:
+        if FILE_ORDER:
+            return []
+
+        if WORDLIST == '-':
+            print('INFO: The wordlist from stdin is scanned in its original order')
+            return []
+
+        counts = load_label_counts(BASE_DIR / 'out')
+        if len(counts) == 0:
+            return []
+
+        ranked = rank_words(iter_wordlist(WORDLIST), counts)
+        print(f'INFO: Trying {len(ranked)} words that were found by previous scans first')
+        return ranked
+
+    def _out_of_time(self) -> bool:
+        return 0 < TIME_BUDGET < time() - self.progress['start']
+
+    def _stopped(self) -> bool:
+        return self.stop.is_set() or self._out_of_time()
+
+    def _print_progress(self, idx: int):
+        if idx % 500 == 0 and idx != 0:
+            runtime = time() - self.progress['start']
+            print(f'INFO: {idx} words in {int(runtime)}s ({int(idx / runtime)}/s)')
+
+    def _check_target(self) -> bool:
         try:
-            self.results['__NS'] = [r.to_text() for r in self.dns.resolve(TARGET, 'NS')]
+            self.results['__NS'] = self.dns.resolve(self.target, 'NS')
+            return True
+
+        except NoAnswer:
+            # the domain exists but is no zone of its own (p.e. a subdomain as target)
+            self.results['__NS'] = []
+            return True
 
         except NXDOMAIN:
-            print(f"ERROR: The domain '{TARGET}' is not resolvable! Check it for typos!")
-            sys_exit(1)
+            print(f"ERROR: The domain '{self.target}' is not resolvable! Check it for typos!")
+            return False
 
-        try:
-            self.results['__MX'] = [r.to_text() for r in self.dns.resolve(TARGET, 'MX')]
+        except (LifetimeTimeout, NoNameservers):
+            print(f"ERROR: The nameservers of the domain '{self.target}' could not be resolved!")
+            return False
 
-        except (NoAnswer, NXDOMAIN):
-            pass
+    def _stage_records(self) -> Iterator[tuple[str, str, None]]:
+        # the basic records and certificates are only processed by the first shard
+        if SHARD_INDEX != 0 or self._stage_skipped('records'):
+            return
 
-        try:
-            self.results['__TXT'] = [r.to_text() for r in self.dns.resolve(TARGET, 'TXT')]
+        for key, name, rdtype in [
+            ('__MX', self.target, 'MX'), ('__TXT', self.target, 'TXT'), ('__DMARC', self._subdomain('_dmarc'), 'TXT'),
+        ]:
+            try:
+                records = self.dns.resolve(name, rdtype)
+                with self.lock:
+                    self.results[key] = records
+
+            except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers):
+                pass
+
+        if '__TXT' in self.results:
             print('PARSING SPF')
-            for sd in self._parse_spf(self.results['__TXT']):
-                self._lookup(sd)
+            for d in self._parse_spf(self.results['__TXT']):
+                yield d, 'spf', None
 
-        except (NoAnswer, NXDOMAIN):
-            pass
+        self._stage_produced('records')
 
-        try:
-            self.results['__DMARC'] = [r.to_text() for r in self.dns.resolve(subdomain('_dmarc'), 'TXT')]
+    def _stage_certificates(self) -> Iterator[tuple[str, str, None]]:
+        if SHARD_INDEX != 0 or self._stage_skipped('certificates'):
+            return
 
-        except (NoAnswer, NXDOMAIN):
-            pass
+        names, complete = self._get_certificate_domains()
+        for d in names:
+            yield d, 'cert', None
+
+        if complete:
+            # else the resumed scan has to retry the download
+            self._stage_produced('certificates')
+
+    def _acquire_zone(self) -> tuple[list[str], (str, None), bool]:
+        # if the zone can be fetched we do not need to guess its names
+        if SKIP_ZONE:
+            return [], None, False
+
+        print('TRYING TO FETCH THE ZONE')
+        # upstream servers on a custom port are mostly the authoritative ones of internal or lab setups
+        #   public resolvers do not allow zone transfers anyway
+        custom = [ns for ns in NAMESERVERS if ns.find('#') != -1]
+        names = zone_transfer(self.dns, zone=self.target, nameservers=self.results.get('__NS', []) + custom)
+        if names is not None:
+            return names, 'axfr', True
+
+        names, complete = nsec_walk(self.dns, zone=self.target)
+        if names is not None:
+            print(f"INFO: Walked the NSEC chain ({len(names)} names, {'complete' if complete else 'incomplete'})")
+            return names, 'nsec', complete
+
+        return [], None, False
+
+    def _stage_wordlist(self, zone: tuple[list[str], (str, None), bool] = None) -> Iterator[tuple[str, str, (int, None)]]:
+        names, source, complete = self._acquire_zone() if zone is None else zone
+        if SHARD_INDEX == 0:
+            for d in names:
+                yield d, source, None
+
+        if complete:
+            print(f'INFO: Got the whole zone via {source.upper()} - skipping the subdomain scan')
+            return
 
-    def _process_certificate_search(self):
-        print()
+        # names we already got from the zone are skipped by the shared duplicate filter
+        print('STARTING SUBDOMAIN SCAN')
+        for idx, word in self._wordlist():
+            self._print_progress(idx)
+            yield self._subdomain(word), 'wordlist', idx
+
+    def _get_certificate_domains(self) -> tuple[set[str], bool]:
         print('PULLING DOMAINS FROM EXISTING CERTIFICATES')
-        domains = []
+        return fetch_certificate_domains(
+            target=self.target, cache_file=BASE_DIR / 'out' / self.target.replace('.', '_') / 'crtsh.json',
+        )
+
+    def _init_authoritative(self):
+        # brute-force queries are sent to the authoritative servers without recursion
+        #   => NXDOMAIN answers come back at their latency and the recursive servers are only used for the hits
+        #   only IPv4 as we can not expect IPv6 connectivity
+        ips = self.dns.resolve_ips(self.results.get('__NS', []), rdtypes=('A',))
+        if len(ips) == 0:
+            print('WARNING: Unable to resolve the authoritative nameservers - using the recursive ones')
+            return
 
-        tries = 0
-        while True:
-            try:
-                certs = request(method='get', url=f'https://crt.sh/?q={TARGET}&output=json', timeout=10).json()
-                break
+        # the limit is shared with the recursive servers => we stay in the global concurrency budget
+        auth = ResolverPool(nameservers=ips, limit=self.dns.limit, recursion=False)
+        try:
+            auth.resolve(self.target, 'SOA')
 
-            except (ReadTimeout, ConnectTimeout, JSONDecodeError):
-                tries += 1
-                if tries >= 4:
-                    print('ERROR: Certificate information could not be downloaded!')
-                    return
+        except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers):
+            print('WARNING: The authoritative nameservers do not answer our queries - using the recursive ones')
+            return
+
+        print(f"INFO: Querying the authoritative nameservers directly: {', '.join(ips)}")
+        self.auth = auth
+
+    def _exists_authoritative(self, dom: str) -> bool:
+        if self.auth is None:
+            return True
+
+        try:
+            self.auth.resolve(dom, 'A')
+
+        except NXDOMAIN:
+            return False
 
-        for c in certs:
-            domains.extend(c['name_value'].split('\n'))
-            cn = c['common_name']
-            if valid_domain(cn):
-                domains.append(cn)
+        except (NoAnswer, LifetimeTimeout, NoNameservers):
+            # other record-types, delegations or unreachable servers => the recursive lookup decides
+            pass
+
+        return True
+
+    def _run_recursion(self):
+        # every subdomain we found becomes the base for another pass - until no new ones are found
+        for level in range(1, RECURSION_DEPTH + 1):
+            if self._stopped():
+                return
+
+            with self.lock:
+                seeds = sorted(
+                    d for d in self.results
+                    if d.endswith(f'.{self.target}') and d.find('*') == -1 and d not in self.expanded
+                )
+
+            if len(seeds) == 0:
+                return
+
+            self.expanded.update(seeds)
+            print(f'STARTING RECURSION LEVEL {level} ({len(seeds)} new bases)')
+            for base in set(seeds + [s.split('.', 1)[1] for s in seeds]):
+                if self._wildcard_of(base) is not None:
+                    print(f'INFO: Not brute-forcing {base} as it has a wildcard record')
+
+            self._run_stages(items=self._stage_recursion(seeds))
+
+    def _wildcard_of(self, base: str) -> (dict, None):
+        if base == self.target:
+            return self.wildcard_ips if self.wildcard_exists else None
+
+        if base not in self.wildcards:
+            exists, ips = self._name_lookup(f'*.{base}')
+            self.wildcards[base] = ips if exists else None
+            if exists:
+                print(f'WARNING: Found the wildcard record *.{base} - ignoring all records below {base} that match it')
+
+        return self.wildcards[base]
+
+    def _stage_recursion(self, seeds: list[str]) -> Iterator[tuple[str, str, None]]:
+        # the candidates are generated lazily => their amount is not limited by the available memory
+        for base in seeds:
+            if self._wildcard_of(base) is None:
+                for word in islice(iter_wordlist(RECURSION_WORDLIST), RECURSION_WORDS):
+                    yield f'{word}.{base}', 'recursive', None
+
+        siblings = {}
+        for s in seeds:
+            label, parent = s.split('.', 1)
+            siblings.setdefault(parent, []).append(label)
+
+        for s in seeds:
+            label, parent = s.split('.', 1)
+            if self._wildcard_of(parent) is not None:
+                # the wildcard of the parent answers every permutation
+                continue
 
-        for d in set(domains):
-            self._lookup(d)
+            words = PERMUTATION_WORDS + [l for l in siblings[parent][:PERMUTATION_MAX_SIBLINGS] if l != label]
+            for d in iter_permutations(s, words):
+                yield d, 'permutation', None
 
     def _check_for_wildcard(self):
-        ws = subdomain('*')
+        ws = self._subdomain('*')
         wildcard_exists, wildcard_ips = self._name_lookup(ws)
         print()
-        print('HAS WILDCARD:', wildcard_exists)
+        print(f'HAS WILDCARD ({ws}):', wildcard_exists)
         if wildcard_exists:
             wildcard_ptrs = self._ptr_lookup_ips(wildcard_ips)
-            self.results[ws] = {'ip': wildcard_ips, 'ptr': wildcard_ptrs}
+            self._add_result(ws, wildcard_ips, wildcard_ptrs, source='wildcard')
             self._check_ptrs(wildcard_ptrs, ws)
 
-            print('WARNING: We will ignore all records that match the wildcard. Some generic ones might be missing!')
+            print(
+                f'WARNING: We will ignore all records below {self.target} that match its wildcard. '
+                'Some generic ones might be missing!'
+            )
 
         return wildcard_exists, wildcard_ips
 
     def _name_lookup(self, dns: str) -> tuple[bool, dict]:
         ips = {}
-        try:
-            retry = 0
-            while True:
-                try:
-                    ips['ip4'] = [r.to_text() for r in self.dns.resolve(dns, 'A')]
-                    break
-
-                except (LifetimeTimeout, NoNameservers):
-                    if retry >= 5:
-                        raise NXDOMAIN
-
-                    retry += 1
-                    continue
-
-        except (NoAnswer, NXDOMAIN):
-            ips['ip4'] = []
-
-        try:
-            retry = 0
-            while True:
-                try:
-                    ips['ip6'] = [r.to_text() for r in self.dns.resolve(dns, 'AAAA')]
-                    break
-
-                except (LifetimeTimeout, NoNameservers):
-                    if retry >= 5:
-                        raise NXDOMAIN
-
-                    retry += 1
-                    continue
+        for ipp, rdtype in [('ip4', 'A'), ('ip6', 'AAAA')]:
+            try:
+                ips[ipp] = self.dns.resolve(dns, rdtype)
 
-        except (NoAnswer, NXDOMAIN):
-            ips['ip6'] = []
+            except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers):
+                ips[ipp] = []
 
         return (len(ips['ip4']) > 0 or len(ips['ip6']) > 0), ips
 
@@ -230,20 +654,9 @@ class DNSRecon:
 
         for ip in ips:
             try:
-                retry = 0
-                while True:
-                    try:
-                        ptrs.extend([p.to_text() for p in self.dns.resolve_address(ip)])
-                        break
+                ptrs.extend(self.dns.resolve_address(ip))
 
-                    except (LifetimeTimeout, NoNameservers):
-                        if retry >= 5:
-                            raise NXDOMAIN
-
-                        retry += 1
-                        continue
-
-            except (NoAnswer, NXDOMAIN, DNSSyntaxError):
+            except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers, DNSSyntaxError):
                 continue
 
         return ptrs
@@ -276,31 +689,35 @@ class DNSRecon:
 
                     elif pk in ['include', 'redirect']:
                         # recurse if we should follow the lead
-                        if not allow_follow(pv):
+                        if not self._allow_follow(pv):
                             continue
 
                         try:
-                            spf_domains.extend(self._parse_spf(
-                                [r.to_text() for r in self.dns.resolve(pv, 'TXT')]
-                            ))
+                            spf_domains.extend(self._parse_spf(self.dns.resolve(pv, 'TXT')))
 
-                        except (NoAnswer, NXDOMAIN):
+                        except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers):
                             pass
 
                 return spf_domains
 
         return []
 
+    def _is_wildcard(self, ips: dict, dom: str) -> bool:
+        # every level can have its own wildcard record => compare to the one of the parent domain
+        #   the levels we did not check are covered by the wildcard of the target
+        parent = dom.split('.', 1)[-1]
+        wildcard_ips = self.wildcards[parent] if parent in self.wildcards else self._wildcard_of(self.target)
+        return wildcard_ips is not None and \
+            ips['ip4'] == wildcard_ips['ip4'] and ips['ip6'] == wildcard_ips['ip6']
+
     def _get_ips_if_relevant(self, dom: str, wildcard_filter: bool = True) -> (dict, None):
-        if dom in self.results:
+        # the domain stays claimed until its result is stored => concurrent lookups of it are skipped
+        if not self._claim(dom):
             return None
 
         exists, ips = self._name_lookup(dom)
-        if not exists:
-            return None
-
-        if wildcard_filter and self.wildcard_exists and \
-                ips['ip4'] == self.wildcard_ips['ip4'] and ips['ip6'] == self.wildcard_ips['ip6']:
+        if not exists or (wildcard_filter and self._is_wildcard(ips, dom)):
+            self._release(dom)
             return None
 
         return ips
@@ -309,37 +726,485 @@ class DNSRecon:
         for ipp in ['ip4', 'ip6']:
             for d in ptrs[ipp]:
                 d = d[:-1]
-                if d != ptr_domain and allow_follow(d) and d not in self.results:
+                if d != ptr_domain and self._allow_follow(d) and d not in self.results:
                     ips2 = self._get_ips_if_relevant(d, False)
                     if ips2 is None:
                         continue
 
                     print('FOUND:', d, '(PTR)')
-                    ptrs2 = self._ptr_lookup_ips(ips2)
+                    self._add_result(d, ips2, self._ptr_lookup_ips(ips2), source='ptr')
+
+    def _claim(self, dom: str) -> bool:
+        with self.lock:
+            if dom in self.results or dom in self.in_flight:
+                return False
+
+            self.in_flight.add(dom)
+            return True
 
-                    with self.lock:
-                        self.results[d] = {'ip': ips2, 'ptr': ptrs2}
+    def _release(self, dom: str):
+        with self.lock:
+            self.in_flight.discard(dom)
+
+    def _add_result(self, dom: str, ips: dict, ptrs: dict, source: str):
+        with self.lock:
+            self.results.add_host(dom, ips, ptrs)
+            self.in_flight.discard(dom)
 
-    def _lookup(self, dom: str):
+        if self.stream is not None:
+            self.stream.write({'domain': dom, 'ip': ips, 'ptr': ptrs, 'source': source})
+
+    def _lookup(self, dom: str, source: str):
         dom = dom.lower()
         if dom.endswith('.'):
             dom = dom[:-1]
 
-        ips = self._get_ips_if_relevant(dom)
+        brute_forced = source in BRUTE_FORCE_SOURCES
+        if brute_forced and not self._exists_authoritative(dom):
+            return
+
+        # only the names of the zone itself are real records - certificates and SPF may list stale names
+        #   that are now answered by the wildcard
+        ips = self._get_ips_if_relevant(dom, wildcard_filter=source not in ZONE_SOURCES)
         if ips is None:
             return
 
         print('FOUND:', dom)
 
         ptrs = self._ptr_lookup_ips(ips)
+        self._add_result(dom, ips, ptrs, source=source)
+        self._check_ptrs(ptrs, dom)
 
-        with self.lock:
-            self.results[dom] = {'ip': ips, 'ptr': ptrs}
 
-        self._check_ptrs(ptrs, dom)
+class AsyncDNSRecon(DNSRecon):
+    # same logic as DNSRecon, but lookups are run as coroutines on a single event-loop
+    #   which allows for way more queries in-flight than threads would
+    @staticmethod
+    def init_limit() -> AdaptiveLimit:
+        return AsyncAdaptiveLimit(maximum=IN_FLIGHT)
+
+    def _run_stages(self, items: Iterator[tuple[str, str, (int, None)]] = None):
+        asyncio_run(self._run_stages_async(items))
+
+    async def _run_stages_async(self, items: Iterator[tuple[str, str, (int, None)]] = None):
+        queue = AsyncQueue(maxsize=IN_FLIGHT * 2)
+        workers = [create_task(self._lookup_worker_async(queue)) for _ in range(IN_FLIGHT)]
+        if items is None:
+            stages = [self._stage_records_async(), self._stage_certificates_async(), self._stage_wordlist_async()]
+
+        else:
+            stages = [self._iter_async(items)]
+
+        try:
+            await gather(*[self._produce_async(queue, stage) for stage in stages])
+
+        except CancelledError:
+            # asyncio.run cancels all tasks on Ctrl+C
+            self.stop.set()
+            raise
+
+        for _ in workers:
+            await queue.put(None)
+
+        await gather(*workers)
+        if self.stop.is_set():
+            raise KeyboardInterrupt
+
+    async def _produce_async(self, queue: AsyncQueue, items: AsyncIterator[tuple[str, str, (int, None)]]):
+        async for item in items:
+            if self._stopped():
+                return
+
+            item = self._submit(*item)
+            if item is not None:
+                await queue.put(item)
+
+            if self._checkpoint_due():
+                # writing the checkpoint is blocking => run it in a thread to keep the event-loop going
+                await to_thread(self._save_checkpoint)
+
+    async def _lookup_worker_async(self, queue: AsyncQueue):
+        # a lookup can swallow the cancellation of its task (asyncio.wait_for race) => exit on our own once stopped
+        while not self.stop.is_set():
+            item = await queue.get()
+            if item is None:
+                return
+
+            if self._stopped():
+                continue
+
+            dom, source, idx = item
+            try:
+                await self._lookup_async(dom, source=source)
+
+            except Exception as e:  # pylint: disable=W0718
+                self._lookup_failed(dom, e)
+                continue
+
+            self._item_done(source, idx)
+
+    @staticmethod
+    async def _iter_async(items: Iterator[tuple[str, str, (int, None)]]) -> AsyncIterator[tuple[str, str, (int, None)]]:
+        for item in items:
+            yield item
+
+    async def _stage_records_async(self) -> AsyncIterator[tuple[str, str, None]]:
+        if SHARD_INDEX != 0 or self._stage_skipped('records'):
+            return
+
+        for key, name, rdtype in [
+            ('__MX', self.target, 'MX'), ('__TXT', self.target, 'TXT'), ('__DMARC', self._subdomain('_dmarc'), 'TXT'),
+        ]:
+            try:
+                self.results[key] = await self.dns.resolve_async(name, rdtype)
+
+            except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers):
+                pass
+
+        if '__TXT' in self.results:
+            print('PARSING SPF')
+            for d in await self._parse_spf_async(self.results['__TXT']):
+                yield d, 'spf', None
+
+        self._stage_produced('records')
+
+    async def _stage_certificates_async(self) -> AsyncIterator[tuple[str, str, None]]:
+        if SHARD_INDEX != 0 or self._stage_skipped('certificates'):
+            return
+
+        # the download is blocking => run it in a thread to keep the event-loop going
+        names, complete = await to_thread(self._get_certificate_domains)
+        for d in names:
+            yield d, 'cert', None
+
+        if complete:
+            self._stage_produced('certificates')
+
+    async def _stage_wordlist_async(self) -> AsyncIterator[tuple[str, str, (int, None)]]:
+        # fetching the zone is blocking => run it in a thread to keep the event-loop going
+        zone = await to_thread(self._acquire_zone)
+        for item in self._stage_wordlist(zone):
+            yield item
+
+    async def _name_lookup_async(self, dns: str) -> tuple[bool, dict]:
+        ips = {}
+        for ipp, rdtype in [('ip4', 'A'), ('ip6', 'AAAA')]:
+            try:
+                ips[ipp] = await self.dns.resolve_async(dns, rdtype)
+
+            except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers):
+                ips[ipp] = []
+
+        return (len(ips['ip4']) > 0 or len(ips['ip6']) > 0), ips
+
+    async def _ptr_lookups_async(self, ips: list[str]) -> list:
+        ptrs = []
+
+        for ip in ips:
+            try:
+                ptrs.extend(await self.dns.resolve_address_async(ip))
+
+            except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers, DNSSyntaxError):
+                continue
+
+        return ptrs
+
+    async def _ptr_lookup_ips_async(self, ips: dict) -> dict:
+        return {
+            'ip4': await self._ptr_lookups_async(ips['ip4']),
+            'ip6': await self._ptr_lookups_async(ips['ip6']),
+        }
+
+    async def _parse_spf_async(self, txt_entries: list[str]) -> list:
+        for e in txt_entries:
+            if e.find('v=spf1') != -1:
+                spf_domains = []
+
+                for p in e.split(' '):
+                    try:
+                        pk, pv = p.split(':', 1)
+
+                    except ValueError:
+                        continue
+
+                    if pk in ['ip4', 'ip6']:
+                        spf_domains.extend(await self._ptr_lookups_async([pv]))
+
+                    elif pk in ['a']:
+                        spf_domains.append(pv)
+
+                    elif pk in ['include', 'redirect']:
+                        # recurse if we should follow the lead
+                        if not self._allow_follow(pv):
+                            continue
+
+                        try:
+                            spf_domains.extend(await self._parse_spf_async(await self.dns.resolve_async(pv, 'TXT')))
+
+                        except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers):
+                            pass
+
+                return spf_domains
+
+        return []
+
+    async def _get_ips_if_relevant_async(self, dom: str, wildcard_filter: bool = True) -> (dict, None):
+        # the domain stays claimed until its result is stored => concurrent lookups of it are skipped
+        if not self._claim(dom):
+            return None
+
+        exists, ips = await self._name_lookup_async(dom)
+        if not exists or (wildcard_filter and self._is_wildcard(ips, dom)):
+            self._release(dom)
+            return None
+
+        return ips
 
-    def _lookup_sub(self, word: str):
-        self._lookup(subdomain(word))
+    async def _check_ptrs_async(self, ptrs: dict, ptr_domain: str):
+        for ipp in ['ip4', 'ip6']:
+            for d in ptrs[ipp]:
+                d = d[:-1]
+                if d != ptr_domain and self._allow_follow(d) and d not in self.results:
+                    ips2 = await self._get_ips_if_relevant_async(d, False)
+                    if ips2 is None:
+                        continue
+
+                    print('FOUND:', d, '(PTR)')
+                    self._add_result(d, ips2, await self._ptr_lookup_ips_async(ips2), source='ptr')
+
+    async def _exists_authoritative_async(self, dom: str) -> bool:
+        if self.auth is None:
+            return True
+
+        try:
+            await self.auth.resolve_async(dom, 'A')
+
+        except NXDOMAIN:
+            return False
+
+        except (NoAnswer, LifetimeTimeout, NoNameservers):
+            pass
+
+        return True
+
+    async def _lookup_async(self, dom: str, source: str):
+        dom = dom.lower()
+        if dom.endswith('.'):
+            dom = dom[:-1]
+
+        brute_forced = source in BRUTE_FORCE_SOURCES
+        if brute_forced and not await self._exists_authoritative_async(dom):
+            return
+
+        ips = await self._get_ips_if_relevant_async(dom, wildcard_filter=source not in ZONE_SOURCES)
+        if ips is None:
+            return
+
+        print('FOUND:', dom)
+
+        ptrs = await self._ptr_lookup_ips_async(ips)
+        self._add_result(dom, ips, ptrs, source=source)
+
+        await self._check_ptrs_async(ptrs, dom)
+
+
+class UDPDNSRecon(DNSRecon):
+    # the wordlist is pre-filtered by the raw UDP resolver => the lookup workers only get the names that exist
+    #   their A-answers are seeded into the cache, so the wildcard filter and result handling stay the same
+
+    def _producers(self, queue: Queue) -> list[Thread]:
+        return [
+            Thread(target=self._produce, kwargs={'queue': queue, 'items': self._stage_records()}, daemon=True),
+            Thread(target=self._produce, kwargs={'queue': queue, 'items': self._stage_certificates()}, daemon=True),
+            Thread(target=self._produce_udp, kwargs={'queue': queue}, daemon=True),
+        ]
+
+    def _exists_authoritative(self, dom: str) -> bool:
+        # pylint: disable=W0613
+        # the raw UDP resolver already queried the authoritative servers for the wordlist
+        return True
+
+    def _produce_udp(self, queue: Queue):
+        udp = UDPResolver(
+            nameservers=NAMESERVERS if self.auth is None else list(self.auth.stats),
+            limit=AdaptiveLimit(maximum=IN_FLIGHT, minimum=UDP_MIN_IN_FLIGHT),
+            rdtype='A',
+            recursion=self.auth is None,
+        )
+
+        def _queries() -> Iterator[tuple[str, tuple[str, int]]]:
+            for item in self._stage_wordlist():
+                if self._stopped():
+                    return
+
+                item = self._submit(*item)
+                if self._checkpoint_due():
+                    self._save_checkpoint()
+
+                if item is None:
+                    continue
+
+                dom, source, idx = item
+                if idx is None:
+                    # names from the zone are known to exist
+                    queue.put(item)
+
+                else:
+                    yield dom, (source, idx)
+
+        def _answer(tag: tuple[str, int], dom: str, status: (str, None), records: list[str], ttl: int):
+            source, idx = tag
+            if status == STATUS_NXDOMAIN:
+                self._word_done(idx)
+                return
+
+            if status == STATUS_NOERROR:
+                self.dns.cache.set(cache_key(dom, 'A'), status, records, ttl)
+
+            # existing names (maybe only AAAA) and undecided ones are handled by the regular lookup
+            queue.put((dom, source, idx))
+
+        try:
+            udp.run(queries=_queries(), callback=_answer)
+
+        finally:
+            udp.print_stats()
+            udp.close()
+
+
+def recon_class() -> type[DNSRecon]:
+    return {'async': AsyncDNSRecon, 'udp': UDPDNSRecon}.get(ENGINE, DNSRecon)
+
+
+def init_resolver_pool(recon: type[DNSRecon]) -> ResolverPool:
+    return ResolverPool(
+        nameservers=NAMESERVERS,
+        limit=recon.init_limit(),
+        cache=init_cache(max_size=CACHE_SIZE, disk=DISK_CACHE, max_age=CACHE_MAX_AGE, bypass=CACHE_BYPASS),
+    )
+
+
+def run_target() -> bool:
+    recon = recon_class()
+    pool = init_resolver_pool(recon)
+    try:
+        return recon(target=TARGET, dns=pool).run()
+
+    finally:
+        pool.print_stats()
+        pool.cache.close()
+
+
+def run_shard(config: dict, shard_index: int):
+    # the globals are only set in the main-process => pass them on as the worker might be spawned
+    globals().update(config)
+    globals()['SHARD_INDEX'] = shard_index
+    try:
+        run_target()
+
+    except KeyboardInterrupt:
+        pass
+
+
+def run_sharded():
+    # every process scans its own shard of the wordlist - same as when running them on multiple machines
+    config = {k: v for k, v in globals().items() if k.isupper()}
+    workers = [
+        Process(target=run_shard, kwargs={'config': config, 'shard_index': i})
+        for i in range(SHARD_COUNT)
+    ]
+    for p in workers:
+        p.start()
+
+    try:
+        for p in workers:
+            p.join()
+
+    except KeyboardInterrupt:
+        # the workers got the interrupt too => wait for them to save their checkpoints
+        for p in workers:
+            p.join()
+
+    merge_shards(out=BASE_DIR / 'out' / TARGET.replace('.', '_'), target=TARGET)
+
+
+def load_targets(path: str) -> list[str]:
+    targets = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            target = line.strip().lower().rstrip('.')
+            if target != '' and not target.startswith('#') and target not in targets:
+                targets.append(target)
+
+    return targets
+
+
+def _target_done(target: str) -> bool:
+    out = BASE_DIR / 'out' / target.replace('.', '_')
+    return (out / 'enum.json').is_file() and not (out / 'checkpoint.json').is_file()
+
+
+def _target_worker(recon: type[DNSRecon], pool: ResolverPool, targets: Queue, stop: Event, failed: list):
+    while not stop.is_set():
+        try:
+            target = targets.get_nowait()
+
+        except Empty:
+            return
+
+        print(f'INFO: Scanning target {target}')
+        try:
+            if not recon(target=target, dns=pool, stop=stop).run():
+                failed.append(target)
+
+        except KeyboardInterrupt:
+            return
+
+
+def run_targets(targets: list[str]):
+    # the targets share one resolver pool => its cache, upstream-server stats and concurrency limit
+    #   are re-used instead of building them for every target again
+    if RESUME:
+        done = [t for t in targets if _target_done(t)]
+        if len(done) > 0:
+            print(f'INFO: Skipping {len(done)} targets that were already scanned completely')
+            targets = [t for t in targets if t not in done]
+
+    recon = recon_class()
+    pool = init_resolver_pool(recon)
+    stop = Event()
+    failed = []
+    queue = Queue()
+    for target in targets:
+        queue.put(target)
+
+    workers = [
+        Thread(target=_target_worker, kwargs={
+            'recon': recon, 'pool': pool, 'targets': queue, 'stop': stop, 'failed': failed,
+        }, daemon=True)
+        for _ in range(min(PARALLEL_TARGETS, len(targets)))
+    ]
+    for t in workers:
+        t.start()
+
+    try:
+        # poll instead of joining - an interrupted join marks the thread as stopped even if it is still running
+        while any(t.is_alive() for t in workers):
+            sleep(1)
+
+    except KeyboardInterrupt:
+        # the running targets save their checkpoints => continue them with '--resume'
+        print('WARNING: Stopping the scans of all targets')
+        stop.set()
+        for t in workers:
+            t.join()
+
+    finally:
+        pool.print_stats()
+        pool.cache.close()
+
+    if len(failed) > 0:
+        print(f"WARNING: Failed to scan these targets: {', '.join(sorted(failed))}")
 
 
 if __name__ == '__main__':
@@ -354,17 +1219,175 @@ License: GPLv3
 """)
 
     parser = ArgumentParser()
-    parser.add_argument('-t', '--target', help='Target domain', required=True, type=str)
+    parser.add_argument('-t', '--target', help='Target domain', default=None, type=str)
+    parser.add_argument(
+        '-T', '--targets-file', help='File with one target domain per line (scanned with a shared resolver pool)',
+        default=None, type=str,
+    )
+    parser.add_argument(
+        '--parallel-targets', help='Targets to scan at the same time when using a targets-file', default=4, type=int,
+    )
     parser.add_argument('-f', '--follow', help='Recursively follow unrelated domains', default=False, type=bool)
     parser.add_argument('-p', '--threads', help='Parallel threads to use', default=50, type=int)
-    parser.add_argument('-w', '--wordlist', help='Wordlist to use', default=f'{BASE_DIR}/subdom-5k.txt', type=str)
+    parser.add_argument(
+        '-n', '--nameservers', help='Comma-separated list of upstream DNS servers (format: IP or IP#PORT)',
+        default=DEFAULT_NAMESERVERS, type=str,
+    )
+    parser.add_argument(
+        '-N', '--nameservers-file', help='File with one upstream DNS server per line', default=None, type=str,
+    )
+    parser.add_argument(
+        '-c', '--cache-size', help='Maximum of DNS answers to keep in the in-memory cache', default=100_000, type=int,
+    )
+    parser.add_argument(
+        '-d', '--disk-cache', help='Use the persistent DNS cache shared between runs and tools (out/dns_cache.sqlite3)',
+        default=False, type=bool,
+    )
+    parser.add_argument(
+        '--cache-max-age', help='Re-use cached answers up to this age in seconds (default: use record TTLs)',
+        default=0, type=int,
+    )
+    parser.add_argument(
+        '--cache-bypass', help='Do not read from the persistent DNS cache (it is still updated)',
+        default=False, type=bool,
+    )
+    parser.add_argument(
+        '-w', '--wordlist', help="Wordlist to use (plain, gzip or xz - '-' to read from stdin)",
+        default=f'{BASE_DIR}/subdom-5k.txt', type=str,
+    )
+    parser.add_argument(
+        '--file-order', help='Scan the wordlist in its file order (by default words found by previous scans come first)',
+        default=False, type=bool,
+    )
+    parser.add_argument(
+        '--time-budget', help='Stop the scan after this many seconds (the remaining words can be scanned using --resume)',
+        default=0, type=int,
+    )
+    parser.add_argument(
+        '--dedupe-capacity', help='Expected amount of unique words (sizes the memory-bounded duplicate filter)',
+        default=5_000_000, type=int,
+    )
+    parser.add_argument(
+        '-j', '--jsonl', help='Stream every finding as JSON line to out/<target>/enum.jsonl while scanning',
+        default=False, type=bool,
+    )
+    parser.add_argument(
+        '-r', '--resume', help='Continue the last interrupted scan of the target from its checkpoint',
+        default=False, type=bool,
+    )
+    parser.add_argument(
+        '--checkpoint-interval', help='Seconds between checkpoints of the scan progress', default=60, type=int,
+    )
+    parser.add_argument(
+        '-e', '--engine', help="Lookup engine to use ('udp' sends the wordlist queries as raw UDP packets)",
+        default='threads', type=str, choices=['threads', 'async', 'udp'],
+    )
+    parser.add_argument(
+        '-i', '--in-flight', help='Maximum of parallel DNS queries when using the async or udp engine',
+        default=1000, type=int,
+    )
+    parser.add_argument(
+        '-a', '--authoritative',
+        help='Send the subdomain queries directly to the authoritative nameservers of the target (no recursion)',
+        default=False, type=bool,
+    )
+    parser.add_argument(
+        '--skip-zone', help='Do not try to fetch the zone via AXFR or NSEC-walking before the subdomain scan',
+        default=False, type=bool,
+    )
+    parser.add_argument(
+        '-R', '--recursion-depth', help='Levels to brute-force and permute below the subdomains we found',
+        default=0, type=int,
+    )
+    parser.add_argument(
+        '--recursion-wordlist', help='Wordlist to use for the recursive levels',
+        default=f'{BASE_DIR}/subdom-5k.txt', type=str,
+    )
+    parser.add_argument(
+        '--recursion-words', help='Maximum of words from the recursion-wordlist to try per subdomain',
+        default=500, type=int,
+    )
+    parser.add_argument(
+        '-P', '--processes', help='Scan the wordlist in multiple processes (one shard each) and merge the results',
+        default=1, type=int,
+    )
+    parser.add_argument(
+        '--shard-index', help='Shard of the wordlist to scan on this machine (starting at 0)', default=0, type=int,
+    )
+    parser.add_argument(
+        '--shard-count', help='Amount of shards the wordlist is split into (over all machines)', default=1, type=int,
+    )
+    parser.add_argument(
+        '--merge', help='Merge the outputs of all shards in out/<target>/ (after copying them from the other machines)',
+        default=False, type=bool,
+    )
 
     args = parser.parse_args()
 
+    if (args.target is None) == (args.targets_file is None):
+        print('ERROR: Provide either a target or a targets-file!')
+        sys_exit(1)
+
     TARGET = args.target
-    TARGET_BASE = TARGET.rsplit('.', 1)[0]
     THREADS = args.threads
     FOLLOW_OTHER = args.follow  # if ptrs/spf points to other parent-domains should be scanned (1-layer deep)
     WORDLIST = args.wordlist
+    DEDUPE_CAPACITY = args.dedupe_capacity
+    FILE_ORDER = args.file_order
+    TIME_BUDGET = args.time_budget
+    RESUME = args.resume
+    JSONL = args.jsonl
+    CHECKPOINT_INTERVAL = args.checkpoint_interval
+    IN_FLIGHT = args.in_flight
+    NAMESERVERS = load_nameservers(args.nameservers, args.nameservers_file)
+    CACHE_SIZE = args.cache_size
+    DISK_CACHE = args.disk_cache
+    CACHE_MAX_AGE = args.cache_max_age
+    CACHE_BYPASS = args.cache_bypass
+    ENGINE = args.engine
+    SKIP_ZONE = args.skip_zone
+    AUTHORITATIVE = args.authoritative
+    RECURSION_DEPTH = args.recursion_depth
+    RECURSION_WORDLIST = args.recursion_wordlist
+    RECURSION_WORDS = args.recursion_words
+    SHARD_INDEX = args.shard_index
+    SHARD_COUNT = args.shard_count
+    PARALLEL_TARGETS = max(args.parallel_targets, 1)
+
+    if args.targets_file is not None and (args.processes > 1 or SHARD_COUNT > 1 or args.merge):
+        print('ERROR: Sharding is not supported when using a targets-file!')
+        sys_exit(1)
+
+    if args.processes > 1:
+        if SHARD_COUNT > 1:
+            print('ERROR: Use either multiple processes or shards!')
+            sys_exit(1)
+
+        if WORDLIST == '-':
+            print('ERROR: Multiple processes can not share the wordlist from stdin!')
+            sys_exit(1)
+
+        # the results are always merged from the shard streams
+        SHARD_COUNT = args.processes
+        JSONL = True
+
+    elif SHARD_COUNT > 1:
+        JSONL = True
+
+    if not 0 <= SHARD_INDEX < SHARD_COUNT:
+        print('ERROR: The shard-index has to be lower than the shard-count!')
+        sys_exit(1)
+
+    if args.targets_file is not None:
+        run_targets(load_targets(args.targets_file))
+
+    elif args.merge:
+        merge_shards(out=BASE_DIR / 'out' / TARGET.replace('.', '_'), target=TARGET)
+
+    elif args.processes > 1:
+        run_sharded()
+
+    elif not run_target():
+        sys_exit(1)
 
-    DNSRecon().run()
+    print('DONE')
@@ -4,164 +4,241 @@
 # Copyright (C) 2024 Rath Pascal
 # License: GPLv3
 
-from json import dumps as json_dumps
+from json import dumps as json_dumps, loads as json_loads
 from argparse import ArgumentParser
-from itertools import product
+from collections import OrderedDict
+from asyncio import run as asyncio_run, gather, create_task
+from itertools import product, combinations
 from pathlib import Path
+from typing import Iterator, TextIO
 
+from tldextract import TLDExtract
 from validators import domain as valid_domain
-from dns.resolver import Resolver, NoAnswer, NXDOMAIN, NoNameservers
-
-NAMESERVERS = ['1.1.1.1']
+from resolver_pool import ResolverPool, AsyncAdaptiveLimit, load_nameservers
+from dns_cache import init_cache
+from confusables import load_index as load_confusables
+from dns.resolver import NoAnswer, NXDOMAIN, NoNameservers, LifetimeTimeout
+
+DEFAULT_NAMESERVERS = '1.1.1.1'
+CHECK_CACHE_SIZE = 10_000
+DEFAULT_MAX_SUBSTITUTIONS = 2
 BASE_DIR = Path(__file__).parent.resolve()
+# bundled snapshot of the public-suffix list => no download on every run
+EXTRACT = TLDExtract(suffix_list_urls=(), cache_dir=None)
 
-# see: https://en.wikipedia.org/wiki/IDN_homograph_attack
-HOMOGRAPH = [
-    ['I', 'Ӏ'],
-    ['O', '0'],
-    ['a', 'а'],
-    ['c', 'с'],
-    ['e', 'е'],
-    ['o', 'о'],
-    ['p', 'р'],
-    ['x', 'х'],
-    ['y', 'у'],
-    ['3', 'З'],
-    ['4', 'Ч'],
-    ['6', 'б'],
-    ['і', 'i'],
-    ['ј', 'j'],
-    ['ԛ', 'q'],
-    ['ѕ', 's'],
-    ['ԝ', 'w'],
-    ['Ү', 'Y'],
-    ['Ғ', 'F'],
-    ['Ԍ', 'G'],
-    ['ӓ', 'ä'],
-    ['ӧ', 'ö'],
-    ['ԁ', 'd'],
-    ['һ', 'h'],
-    ['ѵ', 'v'],
-    ['β', 'ß'],
-]
-
-
-def _replace_char(src: str, idx: int, char: str) -> str:
-    return src[:idx] + char + src[idx + 1:]
-
-
-def _get_available_substitutions() -> list[dict]:
-    # target idx => sub idx
-    subs = []
-
-    for idx_translate, h in enumerate(HOMOGRAPH):
-        h_len = len(h)
-        assert h_len == len(set(h))  # all chars inside a homograph list have to be unique
-
-        for idx_original in range(h_len):
-            char_original = h[idx_original]
-            s = TARGET_DOM
-
-            while s.find(char_original) != -1:
-                idx_char_original = s.find(char_original)
-
-                if idx_char_original == -1:
-                    continue
-
-                subs.append({
-                    'o': idx_char_original,
-                    't': idx_translate,
-                })
-
-                s = _replace_char(src=s, idx=idx_char_original, char='_')
-
-    return subs
-
-
-def _build_options(subs: list[dict]) -> list:
-    opt_cnt = 0
-    subs_map = []
-    for sub in subs:
-        t = HOMOGRAPH[sub['t']].copy()
-        t.remove(TARGET_DOM[sub['o']])
-        opt_cnt += len(t) ** 2
-        for tc in t:
-            subs_map.append({'o': sub['o'], 't': tc})
-
-    if opt_cnt == 0:
-        return []
-
-    opts = []
-    for o in product([True, False], repeat=opt_cnt):
-        if max(o) == 0:
-            # no change
-            continue
 
-        spoofed = TARGET_DOM
-        for oi, ov in enumerate(o):
-            if not ov:
+def _substitution_slots() -> list[tuple[int, int, list[str]]]:
+    # one pass over the name => position and length of the replaceable sequences and their alternatives
+    #   sequences can be longer than one character (p.e. 'rn' => 'm') and overlap each other
+    #   see: https://en.wikipedia.org/wiki/IDN_homograph_attack
+    max_len = max(map(len, CONFUSABLES), default=1)
+    slots = []
+    for idx in range(len(TARGET_DOM)):
+        for length in range(1, max_len + 1):
+            seq = TARGET_DOM[idx:idx + length]
+            if len(seq) == length and seq in CONFUSABLES:
+                slots.append((idx, length, CONFUSABLES[seq]))
+
+    return slots
+
+
+def _max_substitutions(slots: list[tuple[int, int, list[str]]]) -> int:
+    return len(slots) if MAX_SUBSTITUTIONS <= 0 else min(MAX_SUBSTITUTIONS, len(slots))
+
+
+def _count_spoofs(slots: list[tuple[int, int, list[str]]]) -> int:
+    # combinations of up to n substituted sequences that do not overlap - each with any of its alternatives
+    #   counts[pos][n] => ways to replace n sequences in front of the position
+    max_subs = _max_substitutions(slots)
+    counts = [[1] + [0] * max_subs] + [[0] * (max_subs + 1) for _ in TARGET_DOM]
+    for pos in range(len(TARGET_DOM)):
+        for n in range(max_subs + 1):
+            counts[pos + 1][n] += counts[pos][n]
+
+        for idx, length, alternatives in slots:
+            if idx == pos:
+                for n in range(max_subs):
+                    counts[pos + length][n + 1] += counts[pos][n] * len(alternatives)
+
+    return sum(counts[-1][1:])
+
+
+def _overlap(positions: tuple[tuple[int, int, list[str]], ...]) -> bool:
+    return any(idx + length > next_idx for (idx, length, _), (next_idx, _, _) in zip(positions, positions[1:]))
+
+
+def _iter_spoofs(slots: list[tuple[int, int, list[str]]]) -> Iterator[str]:
+    # every distinct spoof is generated exactly once and lazily - the ones with the fewest changes first
+    for n in range(1, _max_substitutions(slots) + 1):
+        for positions in combinations(slots, n):
+            if _overlap(positions):
                 continue
 
-            spoofed = _replace_char(src=spoofed, idx=subs_map[oi]['o'], char=subs_map[oi]['t'])
+            for alternatives in product(*[alternatives for _, _, alternatives in positions]):
+                spoofed = []
+                end = 0
+                for (idx, length, _), alternative in zip(positions, alternatives):
+                    spoofed.extend([TARGET_DOM[end:idx], alternative])
+                    end = idx + length
 
-        spoofed = f'{spoofed}.{TARGET_TLD}'
+                spoofed = f"{''.join(spoofed)}{TARGET_DOM[end:]}.{TARGET_TLD}"
+                if valid_domain(spoofed):
+                    yield spoofed
 
-        if not valid_domain(spoofed):
-            continue
 
-        opts.append(spoofed)
+def _registrable(domain: str) -> str:
+    parts = EXTRACT(domain)
+    return f'{parts.domain}.{parts.suffix}' if parts.domain != '' and parts.suffix != '' else domain
+
+
+async def _registered(dns: ResolverPool, domain: str) -> (bool, str):
+    try:
+        if len(await dns.resolve_async(domain, 'NS')) == 0:
+            raise NoAnswer
+
+        return True
 
-    return opts
+    except NXDOMAIN:
+        return False
 
+    except (NoNameservers, NoAnswer, LifetimeTimeout):
+        return 'unknown'
 
-def _check_if_registered(domains: list) -> dict:
-    spoofs = {}
-    dns = Resolver(configure=False)
-    dns.nameservers = NAMESERVERS
 
+class RegistrationChecks:
+    # one check per registrable domain - the other spoofs below it wait for its result
+    #   only the checks in-flight and the results of the recently checked domains are kept
+    #   the spoofs are generated in order => the ones sharing a registrable domain mostly follow each other
+    def __init__(self, dns: ResolverPool, max_size: int):
+        self.dns = dns
+        self.max_size = max_size
+        self.pending = {}
+        self.results = OrderedDict()
+
+    async def check(self, registrable: str) -> (bool, str):
+        if registrable in self.results:
+            self.results.move_to_end(registrable)
+            return self.results[registrable]
+
+        task = self.pending.get(registrable)
+        if task is None:
+            task = create_task(_registered(self.dns, registrable))
+            self.pending[registrable] = task
+
+        exists = await task
+        if self.pending.get(registrable) is task:
+            del self.pending[registrable]
+            self.results[registrable] = exists
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+
+        return exists
+
+
+async def _check_worker(domains: Iterator[str], checks: RegistrationChecks, stream: TextIO) -> int:
+    # the workers share the lazy candidate-iterator => memory does not grow with the amount of spoofs
+    #   returns the amount of skipped domains
+    skipped = 0
     for d in domains:
-        try:
-            if len(dns.resolve(d, 'NS')) == 0:
-                raise NoAnswer
+        registrable = _registrable(d)
+        if registrable == TARGET_REGISTRABLE:
+            # spoofed sub-domain labels of the target itself - whoever owns the target owns those
+            skipped += 1
+            continue
 
-            exists = True
+        exists = await checks.check(registrable)
+        print(json_dumps({d: {'registered': exists}}, ensure_ascii=ASCII))
+        stream.write(json_dumps({'domain': d, 'registrable': registrable, 'registered': exists}, ensure_ascii=False) + '\n')
 
-        except NXDOMAIN:
-            exists = False
+    return skipped
 
-        except (NoNameservers, NoAnswer):
-            exists = 'unknown'
 
-        spoofs[d] = {'registered': exists}
+async def _check_if_registered(domains: Iterator[str], stream: TextIO) -> int:
+    dns = ResolverPool(
+        nameservers=NAMESERVERS,
+        limit=AsyncAdaptiveLimit(maximum=IN_FLIGHT),
+        cache=init_cache(max_size=CHECK_CACHE_SIZE, disk=DISK_CACHE, max_age=CACHE_MAX_AGE, bypass=CACHE_BYPASS),
+    )
 
-    return spoofs
+    checks = RegistrationChecks(dns, max_size=CHECK_CACHE_SIZE)
+    domains = iter(domains)
+    try:
+        return sum(await gather(*[_check_worker(domains, checks, stream) for _ in range(IN_FLIGHT)]))
 
+    finally:
+        dns.cache.close()
 
-def main():
-    d = _check_if_registered(_build_options(_get_available_substitutions()))
 
-    print(json_dumps(d, indent=4, ensure_ascii=ASCII))
+def _write_results(src: Path, f: TextIO, ensure_ascii: bool):
+    # same layout as json_dumps(results, indent=4) - but read line by line from the streamed results
+    f.write('{')
+    first = True
+    with open(src, 'r', encoding='utf-8') as lines:
+        for line in lines:
+            result = json_loads(line)
+            entry = json_dumps({'registered': result['registered']}, indent=4).replace('\n', '\n    ')
+            f.write(f"{'' if first else ','}\n    {json_dumps(result['domain'], ensure_ascii=ensure_ascii)}: {entry}")
+            first = False
 
-    print('SAVING INFORMATION')
+    f.write('}' if first else '\n}')
+
+
+def main():
+    slots = _substitution_slots()
+    print(f'INFO: Checking up to {_count_spoofs(slots)} spoofed domains')
 
     out = BASE_DIR / 'out' / (TARGET_DOM.replace('.', '_') + '_' + TARGET_TLD)
-    out.mkdir(exist_ok=True)
+    out.mkdir(parents=True, exist_ok=True)
+
+    # the results are streamed while checking - spoof.json is built from them once all are done
+    with open(out / 'spoof.jsonl', 'w', encoding='utf-8', buffering=1) as stream:
+        skipped = asyncio_run(_check_if_registered(_iter_spoofs(slots), stream))
+
+    if skipped > 0:
+        print(f'INFO: Skipped {skipped} spoofed domains below the target itself ({TARGET_REGISTRABLE})')
+
+    print('SAVING INFORMATION')
 
     with open(out / 'spoof.json', 'w', encoding='utf-8') as f:
-        f.write(
-            f'''
-{{
-"ascii": { json_dumps(d, indent=4, ensure_ascii=True) },
-"utf": { json_dumps(d, indent=4, ensure_ascii=False) }
-}}
-''')
+        f.write('\n{\n"ascii": ')
+        _write_results(out / 'spoof.jsonl', f, ensure_ascii=True)
+        f.write(',\n"utf": ')
+        _write_results(out / 'spoof.jsonl', f, ensure_ascii=False)
+        f.write('\n}\n')
 
 
 if __name__ == '__main__':
     parser = ArgumentParser()
     parser.add_argument('-t', '--target', help='Target domain', required=True, type=str)
     parser.add_argument('-a', '--ascii', help='Show spoofing domains in ASCII (show spoofed characters)', default=False, type=bool)
+    parser.add_argument(
+        '-m', '--max-substitutions',
+        help='Maximum of sequences to replace per spoofed domain (0 = no limit - grows exponentially with the length)',
+        default=DEFAULT_MAX_SUBSTITUTIONS, type=int,
+    )
+    parser.add_argument(
+        '-n', '--nameservers', help='Comma-separated list of upstream DNS servers (format: IP or IP#PORT)',
+        default=DEFAULT_NAMESERVERS, type=str,
+    )
+    parser.add_argument(
+        '-N', '--nameservers-file', help='File with one upstream DNS server per line', default=None, type=str,
+    )
+    parser.add_argument(
+        '-i', '--in-flight', help='Maximum of registration checks to run at the same time', default=100, type=int,
+    )
     parser.add_argument('-q', '--quiet', help='Do not show banner', default=False, type=bool)
+    parser.add_argument(
+        '-d', '--disk-cache', help='Use the persistent DNS cache shared between runs and tools (out/dns_cache.sqlite3)',
+        default=False, type=bool,
+    )
+    parser.add_argument(
+        '--cache-max-age', help='Re-use cached answers up to this age in seconds (default: use record TTLs)',
+        default=0, type=int,
+    )
+    parser.add_argument(
+        '--cache-bypass', help='Do not read from the persistent DNS cache (it is still updated)',
+        default=False, type=bool,
+    )
     args = parser.parse_args()
 
     if not args.quiet:
@@ -175,7 +252,15 @@ License: GPLv3
 #####################################################
 """)
 
-    TARGET_DOM, TARGET_TLD = args.target.rsplit('.', 1)
+    TARGET_DOM, TARGET_TLD = args.target.lower().rsplit('.', 1)
+    TARGET_REGISTRABLE = _registrable(args.target.lower())
+    CONFUSABLES = load_confusables()
     ASCII = args.ascii
+    MAX_SUBSTITUTIONS = args.max_substitutions
+    NAMESERVERS = load_nameservers(args.nameservers, args.nameservers_file)
+    IN_FLIGHT = max(args.in_flight, 1)
+    DISK_CACHE = args.disk_cache
+    CACHE_MAX_AGE = args.cache_max_age
+    CACHE_BYPASS = args.cache_bypass
 
     main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from json import dumps as json_dumps, loads as json_loads, JSONDecodeError
+from pathlib import Path
+from threading import Lock
+from typing import Iterator
+
+from wordlist import normalize_word
+from atomic_file import write_atomic
+
+INDEX_FILE = 'label_index.json'
+INDEX_LOCK = Lock()
+
+
+def _target_of(results: dict) -> (str, None):
+    for key, value in results.items():
+        if isinstance(value, dict) and 'shodan_url' in value:
+            return key
+
+    return None
+
+
+def _labels_of(results: dict) -> list[str]:
+    # the part in front of the target - and its first label for names that are multiple levels deep
+    target = _target_of(results)
+    if target is None:
+        return []
+
+    labels = set()
+    for key in results:
+        if not key.endswith(f'.{target}'):
+            continue
+
+        sub = normalize_word(key[:-len(target) - 1])
+        if sub is not None:
+            labels.add(sub)
+            labels.add(sub.split('.', 1)[0])
+
+    return sorted(labels)
+
+
+class LabelIndex:
+    # labels found by our previous scans (out/*/enum.json) => how many targets they exist at
+    #   the outputs are only parsed again if they changed since the index was saved
+    def __init__(self, out: Path):
+        self.out = out
+        self.path = out / INDEX_FILE
+        self.outputs = {}
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.outputs = json_loads(f.read())
+
+        except FileNotFoundError:
+            pass
+
+        except JSONDecodeError:
+            print(f'WARNING: Ignoring the corrupt label index {self.path}')
+
+    def update(self):
+        outputs = {}
+        for file in self.out.glob('*/enum.json'):
+            key = file.parent.name
+            mtime = file.stat().st_mtime
+            known = self.outputs.get(key)
+            if known is not None and known['mtime'] == mtime:
+                outputs[key] = known
+                continue
+
+            try:
+                with open(file, 'r', encoding='utf-8') as f:
+                    outputs[key] = {'mtime': mtime, 'labels': _labels_of(json_loads(f.read()))}
+
+            except (JSONDecodeError, OSError):
+                continue
+
+        changed = outputs != self.outputs
+        self.outputs = outputs
+        if changed:
+            self.save()
+
+    def save(self):
+        write_atomic(self.path, json_dumps(self.outputs))
+
+    def counts(self) -> dict[str, int]:
+        counts = {}
+        for output in self.outputs.values():
+            for label in output['labels']:
+                counts[label] = counts.get(label, 0) + 1
+
+        return counts
+
+
+def load_label_counts(out: Path) -> dict[str, int]:
+    with INDEX_LOCK:
+        index = LabelIndex(out)
+        index.update()
+        return index.counts()
+
+
+def rank_words(words: Iterator[str], counts: dict[str, int]) -> list[str]:
+    # the words of the wordlist that were found before - most frequent first, ties in wordlist order
+    #   only those are held in memory, the rest of the wordlist keeps being streamed in file order
+    ranked = {}
+    for idx, word in enumerate(words):
+        if word in counts and word not in ranked:
+            ranked[word] = (-counts[word], idx)
+
+    return sorted(ranked, key=ranked.get)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from re import compile as regex_compile
+from typing import Iterator
+
+from wordlist import LABEL_REGEX
+
+NUMBER_REGEX = regex_compile(r'\d+')
+NUMBER_STEPS = 3
+PERMUTATION_WORDS = [
+    'dev', 'test', 'stage', 'staging', 'prod', 'int', 'internal', 'qa', 'uat', 'demo',
+    'api', 'admin', 'old', 'new', 'beta', 'backup', 'v1', 'v2',
+]
+
+
+def _number_increments(label: str) -> Iterator[str]:
+    # web01 => web02, web03, web00 (keeping the zero-padding)
+    for m in NUMBER_REGEX.finditer(label):
+        n = int(m.group())
+        for step in range(-NUMBER_STEPS, NUMBER_STEPS + 1):
+            if step == 0 or n + step < 0:
+                continue
+
+            yield label[:m.start()] + str(n + step).zfill(len(m.group())) + label[m.end():]
+
+
+def _dash_joins(label: str) -> Iterator[str]:
+    # test-api => testapi, api-test, test, api
+    parts = label.split('-')
+    if len(parts) < 2:
+        return
+
+    yield ''.join(parts)
+    yield '-'.join(reversed(parts))
+    yield from parts
+
+
+def _word_insertions(label: str, words: list[str]) -> Iterator[str]:
+    for w in words:
+        if w != label:
+            yield f'{w}-{label}'
+            yield f'{label}-{w}'
+            yield f'{label}{w}'
+
+
+def iter_permutations(name: str, words: list[str]) -> Iterator[str]:
+    # variations of the first label of an existing name => its siblings in the same zone
+    #   the candidates are generated lazily and might contain duplicates
+    label, parent = name.split('.', 1)
+    for generator in [_number_increments(label), _dash_joins(label), _word_insertions(label, words)]:
+        for candidate in generator:
+            if candidate != label and LABEL_REGEX.match(candidate) is not None:
+                yield f'{candidate}.{parent}'
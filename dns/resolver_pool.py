@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from threading import Condition, Lock, Event
+from collections import deque
+from time import time, sleep
+from random import random, choices
+from asyncio import sleep as asyncio_sleep, get_running_loop, shield
+
+from dns_cache import AnswerCache, cache_key, negative_ttl, raise_cached, \
+    STATUS_NOERROR, STATUS_NXDOMAIN, STATUS_NOANSWER
+from dns.resolver import Resolver, NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers
+from dns.asyncresolver import Resolver as AsyncResolver
+from dns.reversename import from_address
+
+RETRIES = 5
+TIMEOUT = 3
+BACKOFF_BASE = 0.1
+BACKOFF_MAX = 3
+EWMA_WEIGHT = 0.1
+UNHEALTHY_TIMEOUT_RATE = 0.3
+AIMD_MAX_TIMEOUT_RATE = 0.05
+
+
+def parse_nameserver(ns: str, default_port: int = 53) -> tuple[str, int]:
+    # format: 'IP' or 'IP#PORT'
+    host, port = ns.split('#', 1) if ns.find('#') != -1 else (ns, default_port)
+    return host, int(port)
+
+
+def load_nameservers(nameservers: str, nameservers_file: str = None) -> list[str]:
+    servers = [ns.strip() for ns in nameservers.split(',') if ns.strip() != '']
+
+    if nameservers_file is not None:
+        with open(nameservers_file, 'r', encoding='utf-8') as f:
+            for l in f:
+                l = l.strip()
+                if l != '' and not l.startswith('#'):
+                    servers.append(l)
+
+    return list(dict.fromkeys(servers))
+
+
+class AdaptiveLimit:
+    # AIMD => grow by one slot after each window of queries without too many timeouts,
+    #   halve the slots if the upstream servers start to time out
+    def __init__(self, maximum: int, minimum: int = 1):
+        self.maximum = max(maximum, 1)
+        self.minimum = max(min(minimum, self.maximum), 1)
+        self.limit = self.maximum
+        self.in_use = 0
+        self.window_queries = 0
+        self.window_timeouts = 0
+        self.lock = Condition()
+
+    def feedback(self, timeout: bool):
+        with self.lock:
+            self.window_queries += 1
+            if timeout:
+                self.window_timeouts += 1
+
+            if self.window_queries < self.limit:
+                return
+
+            if self.window_timeouts / self.window_queries > AIMD_MAX_TIMEOUT_RATE:
+                self.limit = max(self.minimum, self.limit // 2)
+
+            else:
+                self.limit = min(self.maximum, self.limit + 1)
+
+            self.window_queries = 0
+            self.window_timeouts = 0
+            self._wake()
+
+    def _wake(self):
+        self.lock.notify_all()
+
+    def acquire(self):
+        with self.lock:
+            while self.in_use >= self.limit:
+                self.lock.wait()
+
+            self.in_use += 1
+
+    def release(self):
+        with self.lock:
+            self.in_use -= 1
+            self._wake()
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *_):
+        self.release()
+
+
+class AsyncAdaptiveLimit(AdaptiveLimit):
+    # waiters are plain futures so the limit can be shared by event-loops running in multiple threads
+    def __init__(self, maximum: int, minimum: int = 1):
+        super().__init__(maximum=maximum, minimum=minimum)
+        self.waiters = deque()
+
+    @staticmethod
+    def _set_waiter(waiter):
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def _wake(self):
+        # blocking callers (p.e. the sequential checks before the scan) wait on the condition
+        super()._wake()
+        free = self.limit - self.in_use
+        while free > 0 and len(self.waiters) > 0:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(self._set_waiter, waiter)
+                free -= 1
+
+    async def acquire_async(self):
+        while True:
+            with self.lock:
+                if self.in_use < self.limit:
+                    self.in_use += 1
+                    return
+
+                waiter = get_running_loop().create_future()
+                self.waiters.append(waiter)
+
+            await waiter
+
+    async def __aenter__(self):
+        await self.acquire_async()
+
+    async def __aexit__(self, *_):
+        self.release()
+
+
+class SingleFlight:
+    # concurrent callers asking for the same key wait for the one query that is already in-flight
+    def __init__(self):
+        self.lock = Lock()
+        self.calls = {}
+        self.calls_async = {}
+        self.coalesced = 0
+
+    def do(self, key: tuple, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': Event(), 'result': None, 'error': None}
+                self.calls[key] = call
+
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+
+        except Exception as e:
+            call['error'] = e
+            raise
+
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+            call['done'].set()
+
+    async def do_async(self, key: tuple, coro_fn):
+        # futures can only be awaited on their own event-loop => coalesce per loop
+        loop = get_running_loop()
+        key = (loop, key)
+        call = self.calls_async.get(key)
+        if call is not None:
+            self.coalesced += 1
+            return await shield(call)
+
+        call = loop.create_future()
+        self.calls_async[key] = call
+        try:
+            result = await coro_fn()
+            call.set_result(result)
+            return result
+
+        except Exception as e:
+            call.set_exception(e)
+            # mark the exception as retrieved in case no one else waited for it
+            call.exception()
+            raise
+
+        finally:
+            del self.calls_async[key]
+            if not call.done():
+                call.cancel()
+
+
+class ResolverPool:
+    # pylint: disable=R0902
+    # spreads the queries over multiple upstream servers
+    #   and prefers the ones that answer fast and do not time out
+    #   without recursion the servers need to be authoritative for the names we query
+    def __init__(self, nameservers: list[str], limit: AdaptiveLimit, cache: AnswerCache = None, recursion: bool = True):
+        self.limit = limit
+        self.recursion = recursion
+        self.cache = cache if cache is not None else AnswerCache(max_size=0)
+        self.flight = SingleFlight()
+        self.lock = Lock()
+        self.stats = {}
+        self.resolvers = {}
+        self.async_resolvers = {}
+
+        for ns in nameservers:
+            self.stats[ns] = {'latency': 0.1, 'timeout_rate': 0.0, 'queries': 0, 'timeouts': 0}
+            self.resolvers[ns] = self._init_resolver(Resolver(configure=False), ns)
+            self.async_resolvers[ns] = self._init_resolver(AsyncResolver(configure=False), ns)
+
+    def _init_resolver(self, resolver: (Resolver, AsyncResolver), ns: str) -> (Resolver, AsyncResolver):
+        ip, port = parse_nameserver(ns)
+        resolver.nameservers = [ip]
+        resolver.port = port
+        resolver.timeout = TIMEOUT
+        resolver.lifetime = TIMEOUT
+        if not self.recursion:
+            resolver.flags = 0
+
+        return resolver
+
+    def _pick(self, tried: list[str]) -> str:
+        with self.lock:
+            candidates = [ns for ns in self.stats if ns not in tried]
+            if len(candidates) == 0:
+                candidates = list(self.stats)
+
+            healthy = [ns for ns in candidates if self.stats[ns]['timeout_rate'] < UNHEALTHY_TIMEOUT_RATE]
+            weights = []
+            for ns in candidates:
+                s = self.stats[ns]
+                w = 1 / (s['latency'] * (1 + 10 * s['timeout_rate']))
+                if len(healthy) > 0 and ns not in healthy:
+                    # unhealthy servers only get the occasional probe so they can recover
+                    w = w * 0.01
+
+                weights.append(w)
+
+            return choices(candidates, weights=weights)[0]
+
+    def _record(self, ns: str, duration: float, timeout: bool):
+        with self.lock:
+            s = self.stats[ns]
+            s['queries'] += 1
+            if timeout:
+                s['timeouts'] += 1
+
+            else:
+                s['latency'] = (1 - EWMA_WEIGHT) * s['latency'] + EWMA_WEIGHT * duration
+
+            s['timeout_rate'] = (1 - EWMA_WEIGHT) * s['timeout_rate'] + EWMA_WEIGHT * int(timeout)
+
+        self.limit.feedback(timeout)
+
+    def _cache_answer(self, key: tuple[str, str], answer) -> list[str]:
+        records = [r.to_text() for r in answer]
+        # the expiration of the answer respects the lowest TTL of a CNAME chain
+        self.cache.set(key, STATUS_NOERROR, records, int(answer.expiration - time()))
+        return records
+
+    def _cache_negative(self, key: tuple[str, str], e: (NXDOMAIN, NoAnswer)):
+        status = STATUS_NXDOMAIN if isinstance(e, NXDOMAIN) else STATUS_NOANSWER
+        self.cache.set(key, status, [], negative_ttl(e))
+
+    @staticmethod
+    def _backoff(retry: int) -> float:
+        return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** retry)) * (0.5 + random())
+
+    def resolve(self, name: str, rdtype: str) -> list[str]:
+        key = cache_key(name, rdtype)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return raise_cached(*cached)
+
+        return self.flight.do(key, lambda: self._resolve(name, rdtype, key))
+
+    def _resolve(self, name: str, rdtype: str, key: tuple[str, str]) -> list[str]:
+        tried = []
+        retry = 0
+        while True:
+            ns = self._pick(tried)
+            with self.limit:
+                start = time()
+                try:
+                    answer = self.resolvers[ns].resolve(name, rdtype)
+                    self._record(ns, time() - start, False)
+                    return self._cache_answer(key, answer)
+
+                except (NoAnswer, NXDOMAIN) as e:
+                    self._record(ns, time() - start, False)
+                    self._cache_negative(key, e)
+                    raise
+
+                except (LifetimeTimeout, NoNameservers) as e:
+                    self._record(ns, time() - start, isinstance(e, LifetimeTimeout))
+                    if retry >= RETRIES:
+                        raise
+
+            retry += 1
+            tried.append(ns)
+            sleep(self._backoff(retry))
+
+    def resolve_address(self, ip: str) -> list[str]:
+        return self.resolve(from_address(ip), 'PTR')
+
+    async def resolve_async(self, name: str, rdtype: str) -> list[str]:
+        key = cache_key(name, rdtype)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return raise_cached(*cached)
+
+        return await self.flight.do_async(key, lambda: self._resolve_async(name, rdtype, key))
+
+    async def _resolve_async(self, name: str, rdtype: str, key: tuple[str, str]) -> list[str]:
+        tried = []
+        retry = 0
+        while True:
+            ns = self._pick(tried)
+            async with self.limit:
+                start = time()
+                try:
+                    answer = await self.async_resolvers[ns].resolve(name, rdtype)
+                    self._record(ns, time() - start, False)
+                    return self._cache_answer(key, answer)
+
+                except (NoAnswer, NXDOMAIN) as e:
+                    self._record(ns, time() - start, False)
+                    self._cache_negative(key, e)
+                    raise
+
+                except (LifetimeTimeout, NoNameservers) as e:
+                    self._record(ns, time() - start, isinstance(e, LifetimeTimeout))
+                    if retry >= RETRIES:
+                        raise
+
+            retry += 1
+            tried.append(ns)
+            await asyncio_sleep(self._backoff(retry))
+
+    async def resolve_address_async(self, ip: str) -> list[str]:
+        return await self.resolve_async(from_address(ip), 'PTR')
+
+    def resolve_ips(self, names: list[str], rdtypes: tuple[str, ...] = ('A', 'AAAA')) -> list[str]:
+        ips = []
+        for name in names:
+            for rdtype in rdtypes:
+                try:
+                    ips.extend(self.resolve(name, rdtype))
+
+                except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers):
+                    continue
+
+        return list(dict.fromkeys(ips))
+
+    def print_stats(self):
+        print(f'INFO: Concurrency limit at the end: {self.limit.limit}/{self.limit.maximum}')
+        print(
+            f'INFO: Cache - {self.cache.hits} hits, {self.cache.disk_hits} disk hits, {self.cache.misses} misses, '
+            f'{self.flight.coalesced} coalesced'
+        )
+        for ns, s in self.stats.items():
+            print(
+                f"INFO: Nameserver {ns} - {s['queries']} queries, {s['timeouts']} timeouts, "
+                f"{int(s['latency'] * 1000)}ms avg latency"
+            )
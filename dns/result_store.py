@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from socket import inet_pton, inet_ntop, AF_INET, AF_INET6
+from sys import intern
+from typing import Iterator
+
+IP_FAMILIES = {'ip4': (AF_INET, 4), 'ip6': (AF_INET6, 16)}
+
+
+def pack_ips(ips: list[str], ipp: str) -> bytes:
+    family, _ = IP_FAMILIES[ipp]
+    return b''.join(inet_pton(family, ip) for ip in ips)
+
+
+def unpack_ips(packed: bytes, ipp: str) -> list[str]:
+    family, size = IP_FAMILIES[ipp]
+    return [inet_ntop(family, packed[i:i + size]) for i in range(0, len(packed), size)]
+
+
+class HostRecord:
+    # fixed layout instead of nested dicts and lists => one small object per host
+    #   the addresses of a family are packed into one bytes-object, PTR names are interned as many hosts share them
+    __slots__ = ('ip4', 'ip6', 'ptr4', 'ptr6')
+
+    def __init__(self, ips: dict, ptrs: dict):
+        self.ip4 = pack_ips(ips['ip4'], 'ip4')
+        self.ip6 = pack_ips(ips['ip6'], 'ip6')
+        self.ptr4 = tuple(intern(p) for p in ptrs['ip4'])
+        self.ptr6 = tuple(intern(p) for p in ptrs['ip6'])
+
+    def export(self) -> dict:
+        return {
+            'ip': {'ip4': unpack_ips(self.ip4, 'ip4'), 'ip6': unpack_ips(self.ip6, 'ip6')},
+            'ptr': {'ip4': list(self.ptr4), 'ip6': list(self.ptr6)},
+        }
+
+
+def _is_host(value) -> bool:
+    return isinstance(value, dict) and value.keys() == {'ip', 'ptr'}
+
+
+class ResultStore:
+    # the hosts are kept as HostRecords, other entries (target info, basic records) as they are
+    #   they are only converted back to the JSON-shape of the output when they are read or saved
+    def __init__(self):
+        self.entries = {}
+
+    @classmethod
+    def from_json(cls, data: dict):
+        store = cls()
+        for key, value in data.items():
+            if _is_host(value):
+                store.add_host(key, value['ip'], value['ptr'])
+
+            else:
+                store[key] = value
+
+        return store
+
+    def add_host(self, dom: str, ips: dict, ptrs: dict):
+        self.entries[dom] = HostRecord(ips, ptrs)
+
+    def __setitem__(self, key: str, value):
+        self.entries[key] = value
+
+    def __getitem__(self, key: str):
+        value = self.entries[key]
+        return value.export() if isinstance(value, HostRecord) else value
+
+    def get(self, key: str, default=None):
+        return self[key] if key in self.entries else default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def export(self) -> dict:
+        return {key: self[key] for key in self.entries}
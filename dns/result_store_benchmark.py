@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+# compares the memory used by the plain nested result-dicts and the compact ResultStore
+#   using synthetic hosts that look like the ones of a big cloud tenant
+
+from argparse import ArgumentParser
+from random import Random
+from time import time
+from tracemalloc import start as trace_start, stop as trace_stop, get_traced_memory, reset_peak
+
+from result_store import ResultStore
+
+SHARED_PTRS = 200
+
+
+def iter_hosts(count: int, seed: int = 1):
+    rnd = Random(seed)
+    for i in range(count):
+        ip4 = [f'10.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(1, 255)}' for _ in range(rnd.randint(1, 2))]
+        ip6 = [f'2001:db8:{rnd.randrange(65536):x}::{rnd.randrange(1, 65536):x}' for _ in range(rnd.randint(0, 1))]
+        if rnd.random() < 0.5:
+            # load-balancers and CDNs => many hosts point to the same few names
+            ptr4 = [f'lb{rnd.randrange(SHARED_PTRS)}.cloud.example.' for _ in ip4]
+
+        else:
+            ptr4 = [f"host-{ip.replace('.', '-')}.cloud.example." for ip in ip4]
+
+        yield f'host{i}.example.com', {'ip4': ip4, 'ip6': ip6}, {'ip4': ptr4, 'ip6': []}
+
+
+def measure(count: int, compact: bool) -> tuple[int, float]:
+    trace_start()
+    reset_peak()
+    start = time()
+    if compact:
+        results = ResultStore()
+        for dom, ips, ptrs in iter_hosts(count):
+            results.add_host(dom, ips, ptrs)
+
+    else:
+        results = {}
+        for dom, ips, ptrs in iter_hosts(count):
+            results[dom] = {'ip': ips, 'ptr': ptrs}
+
+    used, _ = get_traced_memory()
+    duration = time() - start
+    trace_stop()
+    del results
+    return used, duration
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--hosts', help='Amount of synthetic hosts to store', default=1_000_000, type=int)
+    args = parser.parse_args()
+
+    plain_used, plain_time = measure(args.hosts, compact=False)
+    compact_used, compact_time = measure(args.hosts, compact=True)
+    print(f'INFO: Nested dicts - {plain_used / 1024 / 1024:.1f} MB ({plain_time:.1f}s)')
+    print(f'INFO: ResultStore  - {compact_used / 1024 / 1024:.1f} MB ({compact_time:.1f}s)')
+    print(f'INFO: Reduction    - {100 - compact_used * 100 / plain_used:.0f}%')
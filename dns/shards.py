@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from pathlib import Path
+from shutil import copyfile
+from json import dumps as json_dumps, loads as json_loads, JSONDecodeError
+from sys import exit as sys_exit
+
+
+def merge_shards(out: Path, target: str):
+    print('MERGING SHARDS')
+    shards = sorted(d for d in out.glob('shard-*') if d.is_dir())
+    if len(shards) == 0:
+        print(f'ERROR: No shard outputs found in {out}')
+        sys_exit(1)
+
+    results = {}
+    with open(out / 'enum.jsonl', 'w', encoding='utf-8') as merged:
+        for shard in shards:
+            # basic records and links are only part of the full results
+            try:
+                with open(shard / 'enum.json', 'r', encoding='utf-8') as f:
+                    for k, v in json_loads(f.read()).items():
+                        if k.startswith('__') or k == target:
+                            results.setdefault(k, v)
+
+            except FileNotFoundError:
+                pass
+
+            if (shard / 'whois.json').is_file():
+                copyfile(shard / 'whois.json', out / 'whois.json')
+
+            if not (shard / 'enum.jsonl').is_file():
+                print(f'WARNING: Shard {shard.name} has no findings stream (enum.jsonl)')
+                continue
+
+            with open(shard / 'enum.jsonl', 'r', encoding='utf-8') as f:
+                for l in f:
+                    try:
+                        finding = json_loads(l)
+
+                    except JSONDecodeError:
+                        # the last line of a killed shard might be incomplete
+                        continue
+
+                    if finding['domain'] in results:
+                        continue
+
+                    results[finding['domain']] = {'ip': finding['ip'], 'ptr': finding['ptr']}
+                    merged.write(json_dumps(finding) + '\n')
+
+    with open(out / 'enum.json', 'w', encoding='utf-8') as f:
+        f.write(json_dumps(results, indent=4))
+
+    print(f'INFO: Merged {len(shards)} shards ({len(results)} results) into {out}')
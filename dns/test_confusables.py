@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+# run: python3 -m unittest discover -s dns
+
+from unittest import TestCase, main as unittest_main
+
+from confusables import compile_index, CONFUSABLES_FILE
+
+# the pairs of the hard-coded list the index replaced (IDNA lower-cases the upper-case ones)
+LEGACY_PAIRS = [
+    ('a', 'а'), ('c', 'с'), ('e', 'е'), ('o', 'о'), ('p', 'р'), ('x', 'х'), ('y', 'у'), ('6', 'б'), ('i', 'і'),
+    ('j', 'ј'), ('q', 'ԛ'), ('s', 'ѕ'), ('w', 'ԝ'), ('d', 'ԁ'), ('h', 'һ'), ('v', 'ѵ'), ('ß', 'β'), ('ä', 'ӓ'),
+    ('ö', 'ӧ'),
+]
+
+
+class TestConfusablesIndex(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.index = compile_index(CONFUSABLES_FILE)
+
+    def test_unicode_data(self):
+        with open(CONFUSABLES_FILE, 'r', encoding='utf-8-sig') as f:
+            header = f.read(1024)
+
+        self.assertTrue(header.startswith('# confusables.txt'))
+        self.assertIn('# Version: ', header)
+
+    def test_decomposed_prototypes(self):
+        # 'ӓ' and 'ä' are only confusable after the NFD-decomposition of the skeleton
+        self.assertIn('ӓ', self.index['ä'])
+        self.assertIn('ӧ', self.index['ö'])
+
+    def test_multi_character_prototypes(self):
+        self.assertIn('m', self.index['rn'])
+        self.assertIn('rn', self.index['m'])
+
+    def test_legacy_pairs(self):
+        for char, alternative in LEGACY_PAIRS:
+            self.assertIn(alternative, self.index[char])
+            self.assertIn(char, self.index[alternative])
+
+    def test_registrable(self):
+        # upper-case and compatibility forms are mapped by IDNA => they can not be registered as they are
+        for alternatives in self.index.values():
+            for a in alternatives:
+                self.assertEqual(a, a.lower())
+
+
+if __name__ == '__main__':
+    unittest_main()
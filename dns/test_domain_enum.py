@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+# run: python3 -m unittest discover -s dns
+
+from asyncio import run as asyncio_run
+from socket import socket, AF_INET, SOCK_DGRAM
+from threading import Thread
+from unittest import TestCase, main as unittest_main
+
+import domain_enum
+from domain_enum import DNSRecon, AsyncDNSRecon
+from resolver_pool import ResolverPool, AdaptiveLimit, AsyncAdaptiveLimit
+from dns_cache import init_cache
+from dns.message import from_wire, make_response
+from dns.rcode import NXDOMAIN as RCODE_NXDOMAIN
+from dns.rdatatype import to_text as rdtype_to_text
+from dns.rrset import from_text as rrset_from_text
+
+TARGET = 'example.test'
+WILDCARD_IP = '10.0.0.99'
+RECORDS = {
+    'www.example.test': '10.0.0.1',
+    # a real record that points to the same address as the wildcard
+    'lb.example.test': WILDCARD_IP,
+}
+
+
+class WildcardServer:
+    # minimal authoritative server for a zone with a '*' record - every other name is NXDOMAIN
+    def __init__(self):
+        self.sock = socket(AF_INET, SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.nameserver = f'127.0.0.1#{self.sock.getsockname()[1]}'
+        Thread(target=self._serve, daemon=True).start()
+
+    def _answer(self, query):
+        r = make_response(query)
+        name = query.question[0].name
+        rdtype = rdtype_to_text(query.question[0].rdtype)
+        dom = name.to_text().rstrip('.')
+        if dom in RECORDS or (dom.endswith(f'.{TARGET}') and not dom.endswith('.in-addr.arpa')):
+            if rdtype == 'A':
+                r.answer.append(rrset_from_text(name, 300, 'IN', 'A', RECORDS.get(dom, WILDCARD_IP)))
+
+        elif dom != TARGET:
+            r.set_rcode(RCODE_NXDOMAIN)
+
+        return r
+
+    def _serve(self):
+        while True:
+            data, client = self.sock.recvfrom(4096)
+            self.sock.sendto(self._answer(from_wire(data)).to_wire(), client)
+
+    def close(self):
+        self.sock.close()
+
+
+class TestWildcardFilter(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = WildcardServer()
+        domain_enum.DEDUPE_CAPACITY = 1000
+        domain_enum.FOLLOW_OTHER = False
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def _recon(self, recon: type[DNSRecon], limit: AdaptiveLimit) -> DNSRecon:
+        pool = ResolverPool(nameservers=[self.server.nameserver], limit=limit, cache=init_cache(max_size=1000, disk=False))
+        r = recon(target=TARGET, dns=pool)
+        r.wildcard_exists, r.wildcard_ips = r._check_for_wildcard()  # pylint: disable=W0212
+        self.assertTrue(r.wildcard_exists)
+        return r
+
+    def _check_results(self, r: DNSRecon):
+        # stale certificate/SPF names that are only answered by the wildcard are no findings
+        self.assertNotIn('old.example.test', r.results)
+        self.assertNotIn('gone.example.test', r.results)
+        self.assertIn('www.example.test', r.results)
+        # the zone itself lists the name => it is real even if it matches the wildcard
+        self.assertIn('lb.example.test', r.results)
+
+    def test_threads(self):
+        r = self._recon(DNSRecon, AdaptiveLimit(maximum=2))
+        for dom, source in [
+            ('old.example.test', 'cert'), ('gone.example.test', 'spf'), ('www.example.test', 'cert'),
+            ('lb.example.test', 'axfr'),
+        ]:
+            r._lookup(dom, source=source)  # pylint: disable=W0212
+
+        self._check_results(r)
+
+    def test_async(self):
+        r = self._recon(AsyncDNSRecon, AsyncAdaptiveLimit(maximum=2))
+
+        async def _lookups():
+            for dom, source in [
+                ('old.example.test', 'cert'), ('gone.example.test', 'spf'), ('www.example.test', 'cert'),
+                ('lb.example.test', 'nsec'),
+            ]:
+                await r._lookup_async(dom, source=source)  # pylint: disable=W0212
+
+        asyncio_run(_lookups())
+        self._check_results(r)
+
+    def test_recursion(self):
+        # every name below the seed and every permutation of it is answered by a wildcard
+        r = self._recon(DNSRecon, AdaptiveLimit(maximum=2))
+        self.assertEqual(list(r._stage_recursion(['www.example.test'])), [])  # pylint: disable=W0212
+
+
+if __name__ == '__main__':
+    unittest_main()
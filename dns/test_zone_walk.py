@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+# run: python3 -m unittest discover -s dns
+
+from socket import socket, AF_INET, SOCK_DGRAM, SOCK_STREAM
+from threading import Thread
+from unittest import TestCase, main as unittest_main
+
+from zone_walk import zone_transfer, nsec_walk
+from resolver_pool import ResolverPool, AdaptiveLimit
+from dns_cache import init_cache
+from dns.message import from_wire, make_response
+from dns.rcode import NXDOMAIN as RCODE_NXDOMAIN, REFUSED as RCODE_REFUSED
+from dns.rdataclass import IN
+from dns.rdataset import from_text as rdataset_from_text
+from dns.rdatatype import AXFR, NSEC, SOA, to_text as rdtype_to_text
+from dns.rrset import RRset, from_text as rrset_from_text
+from dns.zone import from_text as zone_from_text
+
+TARGET = 'example.test'
+ZONE = '''
+@ SOA ns1 admin 1 3600 600 86400 60
+@ NS ns1
+ns1 A 127.0.0.1
+www A 10.0.0.1
+api A 10.0.0.3
+*.dev A 10.0.0.4
+'''
+NAMES = ['api.example.test', 'ns1.example.test', 'www.example.test']
+
+
+class ZoneServer:
+    # minimal authoritative server for a signed zone - answers AXFR over TCP and the NSEC chain over UDP
+    def __init__(self, axfr: bool = False, unsigned: list[str] = None, black_lies: bool = False):
+        self.axfr = axfr
+        self.black_lies = black_lies
+        self.zone = zone_from_text(ZONE, origin=f'{TARGET}.', relativize=False)
+        self._sign(unsigned or [])
+
+        self.tcp = socket(AF_INET, SOCK_STREAM)
+        self.tcp.bind(('127.0.0.1', 0))
+        self.tcp.listen(5)
+        port = self.tcp.getsockname()[1]
+        self.sock = socket(AF_INET, SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', port))
+        self.nameserver = f'127.0.0.1#{port}'
+        Thread(target=self._serve, daemon=True).start()
+        Thread(target=self._serve_tcp, daemon=True).start()
+
+    def _sign(self, unsigned: list[str]):
+        names = sorted(self.zone.nodes.keys())
+        for i, name in enumerate(names):
+            if name.to_text().rstrip('.') in unsigned:
+                continue
+
+            types = {rdtype_to_text(rds.rdtype) for rds in self.zone.nodes[name].rdatasets}
+            nxt = names[(i + 1) % len(names)]
+            self.zone.nodes[name].replace_rdataset(
+                rdataset_from_text('IN', 'NSEC', 300, f"{nxt} {' '.join(sorted(types | {'NSEC'}))}"),
+            )
+
+    def _answer(self, query):
+        r = make_response(query)
+        name = query.question[0].name
+        rdtype = query.question[0].rdtype
+        if rdtype == NSEC and self.black_lies:
+            # the server synthesizes a minimal record covering only the queried name
+            r.answer.append(rrset_from_text(name, 300, 'IN', 'NSEC', f'\\000.{name} RRSIG NSEC'))
+            return r
+
+        node = self.zone.get_node(name)
+        if node is None:
+            r.set_rcode(RCODE_NXDOMAIN)
+            return r
+
+        rds = node.get_rdataset(IN, rdtype)
+        if rds is not None:
+            r.answer.append(self._rrset(name, rds))
+
+        return r
+
+    @staticmethod
+    def _rrset(name, rds) -> RRset:
+        rrset = RRset(name, rds.rdclass, rds.rdtype)
+        rrset.update(rds)
+        return rrset
+
+    def _transfer(self, query):
+        r = make_response(query)
+        if not self.axfr:
+            r.set_rcode(RCODE_REFUSED)
+            return r
+
+        soa = self._rrset(self.zone.origin, self.zone.find_rdataset('@', 'SOA'))
+        r.answer.append(soa)
+        for name, node in self.zone.nodes.items():
+            r.answer.extend(self._rrset(name, rds) for rds in node.rdatasets if rds.rdtype != SOA)
+
+        r.answer.append(soa)
+        return r
+
+    def _serve(self):
+        while True:
+            try:
+                data, client = self.sock.recvfrom(4096)
+
+            except OSError:
+                # closed
+                return
+
+            self.sock.sendto(self._answer(from_wire(data)).to_wire(), client)
+
+    def _serve_tcp(self):
+        while True:
+            try:
+                conn, _ = self.tcp.accept()
+
+            except OSError:
+                return
+
+            with conn:
+                size = int.from_bytes(conn.recv(2), 'big')
+                data = b''
+                while len(data) < size:
+                    data += conn.recv(size - len(data))
+
+                query = from_wire(data)
+                if query.question[0].rdtype == AXFR:
+                    wire = self._transfer(query).to_wire()
+
+                else:
+                    wire = self._answer(query).to_wire()
+
+                conn.sendall(len(wire).to_bytes(2, 'big') + wire)
+
+    def close(self):
+        self.sock.close()
+        self.tcp.close()
+
+
+class TestZoneWalk(TestCase):
+    def _pool(self, server: ZoneServer) -> ResolverPool:
+        self.addCleanup(server.close)
+        return ResolverPool(
+            nameservers=[server.nameserver], limit=AdaptiveLimit(maximum=2), cache=init_cache(max_size=1000, disk=False),
+        )
+
+    def test_axfr_allowed(self):
+        server = ZoneServer(axfr=True)
+        self.assertEqual(zone_transfer(self._pool(server), TARGET, [server.nameserver]), NAMES)
+
+    def test_axfr_refused(self):
+        server = ZoneServer()
+        self.assertIsNone(zone_transfer(self._pool(server), TARGET, [server.nameserver]))
+
+    def test_nsec_complete(self):
+        names, complete = nsec_walk(self._pool(ZoneServer()), TARGET)
+        # the wildcard is part of the chain but no name that could be looked up
+        self.assertEqual(names, NAMES)
+        self.assertTrue(complete)
+
+    def test_nsec_incomplete(self):
+        names, complete = nsec_walk(self._pool(ZoneServer(unsigned=['ns1.example.test'])), TARGET)
+        self.assertEqual(names, NAMES[:2])
+        self.assertFalse(complete)
+
+    def test_nsec_black_lies(self):
+        self.assertEqual(nsec_walk(self._pool(ZoneServer(black_lies=True)), TARGET), (None, False))
+
+
+if __name__ == '__main__':
+    unittest_main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from socket import socket, AF_INET, AF_INET6, SOCK_DGRAM, SOL_SOCKET, SO_RCVBUF
+from selectors import DefaultSelector, EVENT_READ
+from struct import pack, unpack_from
+from collections import deque
+from ipaddress import ip_address
+from random import getrandbits
+from time import monotonic
+from typing import Iterator, Callable
+
+from resolver_pool import AdaptiveLimit, parse_nameserver
+from dns_cache import STATUS_NOERROR, STATUS_NXDOMAIN, STATUS_NOANSWER
+from dns.message import from_wire
+from dns.exception import DNSException
+from dns.rdatatype import from_text as rdtype_from_text
+from dns.rdataclass import IN
+
+SOCKETS = 4
+TIMEOUT = 2
+RETRIES = 3
+RECV_SIZE = 4096
+SOCKET_BUFFER = 4 * 1024 * 1024
+SELECT_INTERVAL = 0.05
+
+FLAG_TC = 0x0200
+FLAG_RD = 0x0100
+RCODE_NOERROR = 0
+RCODE_NXDOMAIN = 3
+
+
+class _Query:
+    __slots__ = ('name', 'tag', 'question', 'tries', 'key', 'server')
+
+    def __init__(self, name: str, tag, question: bytes):
+        self.name = name
+        self.tag = tag
+        self.question = question
+        self.tries = 0
+        self.key = None
+        self.server = None
+
+
+def build_question(name: str, rdtype: int) -> bytes:
+    qname = b''.join(
+        len(label).to_bytes(1, 'big') + label
+        for label in name.rstrip('.').encode('idna').split(b'.')
+    )
+    return qname + b'\x00' + pack('!HH', rdtype, IN)
+
+
+class UDPResolver:
+    # pylint: disable=R0902
+    # stateless bulk resolver => queries are written to a few shared non-blocking UDP sockets
+    #   and matched to the answers by socket + transaction-id, without per-query resolver/socket overhead
+    #   answers are only parsed by dnspython if they contain records - most brute-force queries end as NXDOMAIN
+    #   callback(tag, name, status, records, ttl) gets status None if the name could not be decided
+    #   (timeouts, truncation, server-failures) so it can be re-checked with the regular resolver
+    #   the AIMD limit caps the queries in-flight so we do not flood the upstream servers
+    def __init__(self, nameservers: list[str], limit: AdaptiveLimit, rdtype: str = 'A', recursion: bool = True):
+        self.rdtype = rdtype_from_text(rdtype)
+        self.limit = limit
+        self.flags = FLAG_RD if recursion else 0
+        self.servers = []
+        for ns in nameservers:
+            ip, port = parse_nameserver(ns)
+            family = AF_INET6 if ip_address(ip).version == 6 else AF_INET
+            self.servers.append((family, (ip, port)))
+
+        self.selector = DefaultSelector()
+        self.sockets = {}
+        for family in {family for family, _ in self.servers}:
+            self.sockets[family] = []
+            for _ in range(SOCKETS):
+                s = socket(family, SOCK_DGRAM)
+                s.setblocking(False)
+                try:
+                    s.setsockopt(SOL_SOCKET, SO_RCVBUF, SOCKET_BUFFER)
+
+                except OSError:
+                    pass
+
+                s.bind(('::', 0) if family == AF_INET6 else ('0.0.0.0', 0))
+                self.sockets[family].append(s)
+                self.selector.register(s, EVENT_READ)
+
+        self.pending = {}
+        self.resend = deque()
+        # the timeout is the same for all queries => a FIFO ordered by send-time works as timer-wheel
+        self.timeouts = deque()
+        self.next_server = 0
+        self.stats = {'sent': 0, 'received': 0, 'timeouts': 0, 'undecided': 0}
+
+    def _send(self, q: _Query) -> bool:
+        family, addr = self.servers[self.next_server % len(self.servers)]
+        self.next_server += 1
+        sockets = self.sockets[family]
+        s = sockets[self.next_server % len(sockets)]
+
+        while True:
+            txid = getrandbits(16)
+            key = (s.fileno(), txid)
+            if key not in self.pending:
+                break
+
+        try:
+            s.sendto(pack('!HHHHHH', txid, self.flags, 1, 0, 0, 0) + q.question, addr)
+
+        except BlockingIOError:
+            return False
+
+        q.tries += 1
+        q.key = key
+        q.server = addr
+        self.pending[key] = q
+        self.timeouts.append((monotonic() + TIMEOUT, q, q.tries))
+        self.stats['sent'] += 1
+        return True
+
+    def _retry(self, q: _Query, callback: Callable):
+        if q.tries >= RETRIES:
+            self.stats['undecided'] += 1
+            callback(q.tag, q.name, None, [], 0)
+
+        else:
+            self.resend.append(q)
+
+    def _receive(self, s: socket, callback: Callable):
+        while True:
+            try:
+                data, addr = s.recvfrom(RECV_SIZE)
+
+            except (BlockingIOError, InterruptedError):
+                return
+
+            except OSError:
+                # p.e. ICMP port-unreachable from a dead server
+                continue
+
+            if len(data) < 12:
+                continue
+
+            txid, flags, _, ancount = unpack_from('!HHHH', data)
+            q = self.pending.get((s.fileno(), txid))
+            # ignore late or spoofed answers
+            if q is None or addr[:2] != q.server or \
+                    data[12:12 + len(q.question)].lower() != q.question.lower():
+                continue
+
+            del self.pending[q.key]
+            self.stats['received'] += 1
+            self.limit.feedback(timeout=False)
+            rcode = flags & 0x000f
+
+            if flags & FLAG_TC:
+                self.stats['undecided'] += 1
+                callback(q.tag, q.name, None, [], 0)
+
+            elif rcode == RCODE_NXDOMAIN:
+                callback(q.tag, q.name, STATUS_NXDOMAIN, [], 0)
+
+            elif rcode != RCODE_NOERROR:
+                self._retry(q, callback)
+
+            elif ancount == 0:
+                callback(q.tag, q.name, STATUS_NOANSWER, [], 0)
+
+            else:
+                self._parse_answer(q, data, callback)
+
+    def _parse_answer(self, q: _Query, data: bytes, callback: Callable):
+        try:
+            msg = from_wire(data)
+
+        except DNSException:
+            self.stats['undecided'] += 1
+            callback(q.tag, q.name, None, [], 0)
+            return
+
+        # CNAME chains => keep the records of the requested type; the TTL is the lowest of the chain
+        records = []
+        ttl = None
+        for rrset in msg.answer:
+            ttl = rrset.ttl if ttl is None else min(ttl, rrset.ttl)
+            if rrset.rdtype == self.rdtype:
+                records.extend(r.to_text() for r in rrset)
+
+        callback(q.tag, q.name, STATUS_NOERROR if len(records) > 0 else STATUS_NOANSWER, records, ttl or 0)
+
+    def _expire(self, callback: Callable):
+        now = monotonic()
+        while len(self.timeouts) > 0 and self.timeouts[0][0] <= now:
+            _, q, tries = self.timeouts.popleft()
+            # skip queries that were answered or already re-sent
+            if q.tries != tries or self.pending.get(q.key) is not q:
+                continue
+
+            del self.pending[q.key]
+            self.stats['timeouts'] += 1
+            self.limit.feedback(timeout=True)
+            self._retry(q, callback)
+
+    def run(self, queries: Iterator[tuple[str, object]], callback: Callable):
+        queries = iter(queries)
+        exhausted = False
+
+        while True:
+            while len(self.pending) < self.limit.limit:
+                if len(self.resend) > 0:
+                    q = self.resend.popleft()
+
+                elif not exhausted:
+                    try:
+                        name, tag = next(queries)
+
+                    except StopIteration:
+                        exhausted = True
+                        continue
+
+                    q = _Query(name=name, tag=tag, question=build_question(name, self.rdtype))
+
+                else:
+                    break
+
+                if not self._send(q):
+                    # socket buffer is full => wait for answers first
+                    self.resend.appendleft(q)
+                    break
+
+            if exhausted and len(self.pending) == 0 and len(self.resend) == 0:
+                return
+
+            for key, _ in self.selector.select(timeout=SELECT_INTERVAL):
+                self._receive(key.fileobj, callback)
+
+            self._expire(callback)
+
+    def close(self):
+        for sockets in self.sockets.values():
+            for s in sockets:
+                self.selector.unregister(s)
+                s.close()
+
+        self.selector.close()
+
+    def print_stats(self):
+        print(
+            f"INFO: Raw UDP - {self.stats['sent']} queries, {self.stats['received']} answers, "
+            f"{self.stats['timeouts']} timeouts, {self.stats['undecided']} handed to the resolver, "
+            f"in-flight limit at the end: {self.limit.limit}/{self.limit.maximum}"
+        )
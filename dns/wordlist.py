@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from sys import stdin
+from gzip import open as gzip_open
+from lzma import open as xz_open
+from hashlib import blake2b
+from zlib import crc32
+from math import log, ceil
+from re import compile as regex_compile
+from typing import Iterator, TextIO
+
+LABEL_REGEX = regex_compile(r'^[a-z0-9_]([a-z0-9_-]{0,61}[a-z0-9_])?$')
+MAGIC_GZIP = b'\x1f\x8b'
+MAGIC_XZ = b'\xfd7zXZ\x00'
+
+
+class BloomFilter:
+    # memory-bounded set => its size only depends on the capacity and error-rate
+    #   false-positives (p.e. 0.1%) will make us skip a few words once the capacity is reached
+    def __init__(self, capacity: int = 5_000_000, error_rate: float = 0.001):
+        self.size = max(ceil(-capacity * log(error_rate) / (log(2) ** 2)), 8)
+        self.hashes = max(round((self.size / capacity) * log(2)), 1)
+        self.bits = bytearray(ceil(self.size / 8))
+
+    def _positions(self, value: str) -> Iterator[int]:
+        digest = blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, value: str) -> bool:
+        # returns False if the value was (probably) already added
+        new = False
+        for pos in self._positions(value):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                new = True
+
+        return new
+
+
+def open_wordlist(path: str) -> TextIO:
+    if path == '-':
+        return stdin
+
+    with open(path, 'rb') as f:
+        magic = f.read(6)
+
+    if magic.startswith(MAGIC_GZIP):
+        return gzip_open(path, 'rt', encoding='utf-8', errors='ignore')
+
+    if magic.startswith(MAGIC_XZ):
+        return xz_open(path, 'rt', encoding='utf-8', errors='ignore')
+
+    return open(path, 'r', encoding='utf-8', errors='ignore')
+
+
+def normalize_word(word: str) -> (str, None):
+    word = word.strip().lower().strip('.')
+    if word == '' or word.startswith('#'):
+        return None
+
+    for label in word.split('.'):
+        if LABEL_REGEX.match(label) is None:
+            return None
+
+    return word
+
+
+def iter_wordlist(path: str, dedupe: BloomFilter = None) -> Iterator[str]:
+    # stream the wordlist so the memory usage does not depend on its size
+    f = open_wordlist(path)
+    try:
+        for line in f:
+            word = normalize_word(line)
+            if word is None or (dedupe is not None and not dedupe.add(word)):
+                continue
+
+            yield word
+
+    finally:
+        if f is not stdin:
+            f.close()
+
+
+def in_shard(word: str, index: int, count: int) -> bool:
+    # stable between processes and machines - unlike hash() which is randomized per process
+    return count <= 1 or crc32(word.encode('utf-8')) % count == index
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Source: https://github.com/O-X-L/offsec-recon
+# Copyright (C) 2024 Rath Pascal
+# License: GPLv3
+
+from ipaddress import ip_address
+
+from resolver_pool import ResolverPool, parse_nameserver
+from dns.query import xfr
+from dns.zone import from_xfr as zone_from_xfr
+from dns.exception import DNSException
+from dns.resolver import NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers
+
+AXFR_PORT = 53
+AXFR_TIMEOUT = 10
+NSEC_MAX_STEPS = 50_000
+
+
+def _relevant(name: str, zone: str) -> bool:
+    return name != zone and name.endswith(f'.{zone}') and name.find('*') == -1
+
+
+def _transfer_servers(pool: ResolverPool, nameservers: list[str]) -> list[tuple[str, int]]:
+    # format: 'NAME', 'IP' or either of them with '#PORT'
+    servers = []
+    for ns in nameservers:
+        host, port = parse_nameserver(ns, default_port=AXFR_PORT)
+        try:
+            servers.append((str(ip_address(host)), port))
+
+        except ValueError:
+            servers.extend((ip, port) for ip in pool.resolve_ips([host]))
+
+    return list(dict.fromkeys(servers))
+
+
+def zone_transfer(pool: ResolverPool, zone: str, nameservers: list[str]) -> (list[str], None):
+    # misconfigured authoritative servers hand out the whole zone
+    for ip, port in _transfer_servers(pool, nameservers):
+        try:
+            z = zone_from_xfr(
+                xfr(ip, zone, port=port, timeout=AXFR_TIMEOUT, lifetime=AXFR_TIMEOUT, relativize=False),
+                relativize=False,
+            )
+
+        except (DNSException, OSError, EOFError):
+            continue
+
+        print(f"INFO: Zone transfer allowed by {ip}{'' if port == AXFR_PORT else f'#{port}'}")
+        names = {str(name).lower().rstrip('.') for name in z.nodes}
+        return sorted(n for n in names if _relevant(n, zone))
+
+    return None
+
+
+def nsec_walk(pool: ResolverPool, zone: str) -> tuple[(list[str], None), bool]:
+    # DNSSEC-signed zones using NSEC (not NSEC3) link every name to the next one
+    #   returns the names found and if the whole chain could be walked
+    try:
+        pool.resolve(zone, 'NSEC3PARAM')
+        return None, False
+
+    except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers):
+        pass
+
+    names = []
+    name = zone
+    for _ in range(NSEC_MAX_STEPS):
+        try:
+            records = pool.resolve(name, 'NSEC')
+
+        except (NoAnswer, NXDOMAIN, LifetimeTimeout, NoNameservers):
+            break
+
+        nxt = records[0].split(' ', 1)[0].lower().rstrip('.')
+        if nxt.startswith('\\000.'):
+            # 'black lies' => the server synthesizes NSEC records that do not reveal the real names
+            break
+
+        if nxt != zone and not nxt.endswith(f'.{zone}'):
+            break
+
+        if nxt == zone:
+            return names, True
+
+        if nxt.find('*') == -1:
+            names.append(nxt)
+
+        name = nxt
+
+    if len(names) == 0:
+        return None, False
+
+    return names, False